@@ -121,6 +121,48 @@ def test_position_tracker():
     position_tracker.stop_tracking()
 
 
+def test_position_tracker_push():
+    """测试推送模式：控制器推送的位置由追踪线程处理"""
+    print("\n🧪 测试位置追踪推送模式")
+    print("=" * 50)
+    
+    from toio_integration.controller import ToioController
+    
+    controller = ToioController(num_cubes=0, enable_collision_avoidance=False)
+    controller._create_simulated_cubes(2)
+    position_tracker = PositionTracker(controller)
+    
+    received = []
+    moved = threading.Event()
+    
+    def on_position(cube_id, x, y):
+        received.append((threading.current_thread(), cube_id, x, y))
+        if (cube_id, x, y) == ("sim_cube_1", 300, 320):
+            moved.set()
+    
+    position_tracker.add_position_callback(on_position)
+    position_tracker.start_tracking()
+    try:
+        assert position_tracker._push_updates, "控制器支持推送时应使用推送模式"
+        
+        controller.move_to("sim_cube_1", 300, 320)
+        assert moved.wait(timeout=2.0), "未收到推送的位置"
+        
+        thread, cube_id, x, y = received[-1]
+        print(f"推送位置: {cube_id} -> ({x}, {y})，处理线程: {thread.name}")
+        # 回调在追踪线程中执行，而不是控制器的事件循环线程
+        assert thread is position_tracker.tracking_thread
+        assert position_tracker.get_current_position("sim_cube_1") == (300, 320)
+        assert position_tracker.get_position_history("sim_cube_1")[-1].x == 300
+    finally:
+        position_tracker.stop_tracking()
+        controller.close()
+    
+    # 停止后不再订阅控制器
+    assert controller._position_listeners == ()
+    print("✅ 推送模式测试通过")
+
+
 def test_path_planner():
     """测试路径规划器"""
     print("\n🧪 测试路径规划器")
@@ -148,11 +190,11 @@ def test_path_planner():
     print("🗺️ 请求路径规划...")
     
     # 测试1: 简单路径规划
-    success = path_planner.request_path("cube_1", (100, 100), (400, 400), PlanningPriority.NORMAL)
+    success = path_planner.request_path("cube_1", (100, 100), (400, 400), PlanningPriority.NORMAL).result(timeout=5.0)
     print(f"cube_1路径请求结果: {success}")
     
     # 测试2: 冲突路径规划
-    success = path_planner.request_path("cube_2", (200, 200), (350, 350), PlanningPriority.NORMAL)
+    success = path_planner.request_path("cube_2", (200, 200), (350, 350), PlanningPriority.NORMAL).result(timeout=5.0)
     print(f"cube_2路径请求结果: {success}")
     
     # 等待规划完成
@@ -236,10 +278,13 @@ def main():
         # 测试2: 位置追踪
         test_position_tracker()
         
-        # 测试3: 路径规划
+        # 测试3: 位置追踪推送模式
+        test_position_tracker_push()
+        
+        # 测试4: 路径规划
         test_path_planner()
         
-        # 测试4: 完整集成
+        # 测试5: 完整集成
         test_integrated_system()
         
         print("\n🎉 所有测试完成！")
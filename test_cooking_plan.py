@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+烹饪计划（任务依赖图）执行测试
+
+使用模拟cube测试 execute_cooking_plan 的并行调度、失败跳过和循环检测
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from toio_integration.controller import ToioController
+from toio_integration.cooking_toolkit import CookingToolkit
+
+
+def create_toolkit():
+    """创建使用3个模拟cube的工具包"""
+    controller = ToioController(num_cubes=0, enable_collision_avoidance=False)
+    controller._create_simulated_cubes(3)
+    return controller, CookingToolkit(controller)
+
+
+def run_plan(toolkit, steps):
+    """执行计划并收集事件"""
+    async def _run():
+        events = asyncio.Queue()
+        result = await toolkit.async_execute_cooking_plan(steps, events)
+        collected = []
+        while not events.empty():
+            collected.append(events.get_nowait()[:2])
+        return result, collected
+    return asyncio.run(_run())
+
+
+def test_ready_nodes_overlap(toolkit):
+    """互不依赖的步骤同时执行，后继步骤在前置全部完成后才开始"""
+    print("🧪 测试就绪步骤并行执行...")
+    steps = [
+        {"id": "p1", "robot_id": "chef_1", "action": "pick", "target": "vegetables"},
+        {"id": "p2", "robot_id": "chef_2", "action": "pick", "target": "eggs"},
+        {"id": "p3", "robot_id": "chef_3", "action": "pick", "target": "meat", "depends_on": ["p1", "p2"]},
+    ]
+    result, events = run_plan(toolkit, steps)
+    print(f"事件顺序: {events}")
+
+    assert result["success"], result
+    assert result["completed_actions"] == 3
+    # p1、p2 都在任何步骤完成之前开始
+    first_completed = next(i for i, e in enumerate(events) if e[0] == "TASK_COMPLETED")
+    assert ("TASK_STARTED", "p1") in events[:first_completed]
+    assert ("TASK_STARTED", "p2") in events[:first_completed]
+    # p3 在 p1、p2 完成之后开始
+    p3_started = events.index(("TASK_STARTED", "p3"))
+    assert events.index(("TASK_COMPLETED", "p1")) < p3_started
+    assert events.index(("TASK_COMPLETED", "p2")) < p3_started
+    print("✅ 就绪步骤并行执行测试通过")
+
+
+def test_failure_skips_descendants(toolkit):
+    """失败步骤的后继被跳过，无关步骤照常执行"""
+    print("🧪 测试失败后跳过后继步骤...")
+    steps = [
+        {"id": "bad", "robot_id": "chef_1", "action": "pick", "target": "unicorn"},
+        {"id": "after", "robot_id": "chef_1", "action": "pick", "target": "meat", "depends_on": ["bad"]},
+        {"id": "last", "robot_id": "chef_3", "action": "pick", "target": "eggs", "depends_on": ["after"]},
+        {"id": "other", "robot_id": "chef_2", "action": "pick", "target": "vegetables"},
+    ]
+    result, events = run_plan(toolkit, steps)
+    results = result["results"]
+
+    assert not result["success"]
+    assert not results["bad"]["success"]
+    for node_id in ("after", "last"):
+        assert not results[node_id]["success"]
+        assert "跳过" in results[node_id]["message"]
+        assert ("TASK_STARTED", node_id) not in events
+    assert results["other"]["success"]
+    assert result["completed_actions"] == 1
+    print("✅ 失败跳过测试通过")
+
+
+def test_action_exception(toolkit):
+    """动作抛出异常时记为失败，其余步骤照常完成"""
+    print("🧪 测试动作异常处理...")
+
+    async def explode(self, robot_id, target):
+        raise RuntimeError("模拟故障")
+
+    toolkit._ACTION_DISPATCH = {**CookingToolkit._ACTION_DISPATCH, "explode": explode}
+    try:
+        steps = [
+            {"id": "boom", "robot_id": "chef_1", "action": "explode", "target": "x"},
+            {"id": "after", "robot_id": "chef_1", "action": "pick", "target": "meat", "depends_on": ["boom"]},
+            {"id": "other", "robot_id": "chef_2", "action": "pick", "target": "eggs"},
+        ]
+        result, _ = run_plan(toolkit, steps)
+    finally:
+        del toolkit._ACTION_DISPATCH
+    results = result["results"]
+
+    assert "模拟故障" in results["boom"]["message"]
+    assert "跳过" in results["after"]["message"]
+    assert results["other"]["success"]
+    print("✅ 动作异常处理测试通过")
+
+
+def test_cycle_detection(toolkit):
+    """循环依赖的步骤不执行"""
+    print("🧪 测试循环依赖检测...")
+    steps = [
+        {"id": "ok", "robot_id": "chef_3", "action": "pick", "target": "eggs"},
+        {"id": "a", "robot_id": "chef_1", "action": "pick", "target": "meat", "depends_on": ["b"]},
+        {"id": "b", "robot_id": "chef_2", "action": "pick", "target": "meat", "depends_on": ["a"]},
+    ]
+    result, events = run_plan(toolkit, steps)
+    results = result["results"]
+
+    assert not result["success"]
+    assert results["ok"]["success"]
+    for node_id in ("a", "b"):
+        assert "循环" in results[node_id]["message"]
+        assert ("TASK_STARTED", node_id) not in events
+
+    # 依赖未知步骤和重复ID直接返回错误
+    unknown = toolkit.execute_cooking_plan(
+        [{"id": "a", "robot_id": "chef_1", "action": "pick", "target": "meat", "depends_on": ["zzz"]}])
+    assert not unknown["success"]
+    duplicate = toolkit.execute_cooking_plan([
+        {"id": "a", "robot_id": "chef_1", "action": "pick", "target": "meat"},
+        {"id": "a", "robot_id": "chef_2", "action": "pick", "target": "eggs"},
+    ])
+    assert not duplicate["success"]
+    print("✅ 循环依赖检测测试通过")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 烹饪计划执行测试开始")
+    print("=" * 60)
+
+    controller, toolkit = create_toolkit()
+    try:
+        test_ready_nodes_overlap(toolkit)
+        test_failure_skips_descendants(toolkit)
+        test_action_exception(toolkit)
+        test_cycle_detection(toolkit)
+        print("\n🎉 所有测试完成！")
+    finally:
+        controller.close()
+
+
+if __name__ == "__main__":
+    main()
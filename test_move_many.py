@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+批量移动测试
+
+使用模拟cube测试 ToioController 和 AsyncToioController 的 move_many
+"""
+
+import sys
+import os
+import time
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from toio_integration.controller import ToioController, AsyncToioController
+
+# 模拟cube初始位于 (200, 200)，每个目标距离 300mm，模拟速度下约需 1 秒
+TARGETS = {
+    "sim_cube_1": (200, 500, 0),
+    "sim_cube_2": (500, 200, 90),
+}
+
+
+def check_results(results, positions, elapsed):
+    """检查移动结果：各cube到达目标，未知cube失败，多个cube同时移动"""
+    print(f"移动结果: {results}，耗时: {elapsed:.2f}秒")
+    assert results == {"sim_cube_1": True, "sim_cube_2": True, "missing_cube": False}, results
+    for cube_id, (x, y, _) in TARGETS.items():
+        assert positions[cube_id] == (x, y), positions
+    # 两个cube并行移动，总耗时约为单次移动时间而非两次之和
+    assert 0.8 < elapsed < 1.8, elapsed
+
+
+def test_move_many_sync():
+    """测试 ToioController.move_many"""
+    print("🧪 测试 ToioController.move_many...")
+    controller = ToioController(num_cubes=0, enable_collision_avoidance=False, sim_move_delay=1.0)
+    controller._create_simulated_cubes(2)
+    try:
+        start = time.time()
+        results = controller.move_many({**TARGETS, "missing_cube": (100, 100, 0)})
+        elapsed = time.time() - start
+        check_results(results, controller.get_all_positions(), elapsed)
+    finally:
+        controller.close()
+    print("✅ ToioController.move_many 测试通过")
+
+
+def test_move_many_async():
+    """测试 AsyncToioController.move_many"""
+    print("🧪 测试 AsyncToioController.move_many...")
+
+    async def _run():
+        async with AsyncToioController(sim_move_delay=1.0) as controller:
+            controller._create_simulated_cubes(2)
+            start = time.time()
+            results = await controller.move_many({**TARGETS, "missing_cube": (100, 100, 0)})
+            elapsed = time.time() - start
+            check_results(results, controller.get_all_positions(), elapsed)
+
+    asyncio.run(_run())
+    print("✅ AsyncToioController.move_many 测试通过")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 批量移动测试开始")
+    print("=" * 60)
+
+    test_move_many_sync()
+    test_move_many_async()
+    print("\n🎉 所有测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,6 @@ Toio 控制模块
 
 # 移除旧的toio_controller导入，现在使用真实的controller
 from .cooking_toolkit import CookingToolkit
-from .controller import ToioController
+from .controller import ToioController, AsyncToioController
 
-__all__ = ['ToioController', 'CookingToolkit']
\ No newline at end of file
+__all__ = ['ToioController', 'AsyncToioController', 'CookingToolkit']
\ No newline at end of file
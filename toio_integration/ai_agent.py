@@ -7,6 +7,7 @@ without needing to know low-level details like coordinates or RGB values.
 """
 
 import time
+from math import hypot
 from typing import Dict, List, Optional, Tuple, Union
 from controller import ToioController, CubeState
 from toio.cube.api.motor import CubeLocation, Point
@@ -37,12 +38,12 @@ class ToioAIAgent:
                 for i in range(num_cubes):
                     cube_id = f"sim_cube_{i+1}"
                     # Create a simulated cube directly
-                    self.controller._cubes[cube_id] = CubeState(
+                    self.controller._register_cube(CubeState(
                         id=cube_id,
                         cube=None,
                         position=CubeLocation(point=Point(x=200, y=200), angle=0),
                         connected=True
-                    )
+                    ))
                     print(f"Created simulated cube: {cube_id}")
             else:
                 self.controller = controller if controller else ToioController(num_cubes=num_cubes)
@@ -57,12 +58,12 @@ class ToioAIAgent:
                 # Create a simulated cube directly
                 from toio.cube.api.motor import CubeLocation, Point
                 from component.controller import CubeState
-                self.controller._cubes[cube_id] = CubeState(
+                self.controller._register_cube(CubeState(
                     id=cube_id,
                     cube=None,
                     position=CubeLocation(point=Point(x=200, y=200), angle=0),
                     connected=True
-                )
+                ))
                 print(f"Created simulated cube: {cube_id}")
                 
         self.cubes = self.controller.get_cube_ids()
@@ -476,10 +477,10 @@ class ToioAIAgent:
             return None
             
         # Check if the cube is at a known location
+        x, y = position.point.x, position.point.y
         for location_name, (loc_x, loc_y) in self.locations.items():
             # Check if we're within a reasonable distance of the location
-            distance = ((position.point.x - loc_x) ** 2 + (position.point.y - loc_y) ** 2) ** 0.5
-            if distance < 30:  # Within 30 units
+            if hypot(x - loc_x, y - loc_y) < 30:  # Within 30 units
                 return location_name
                 
         return None
@@ -6,6 +6,7 @@ toio机器人避障系统 - A*算法核心模块
 
 import math
 import heapq
+import itertools
 import threading
 import time
 from typing import List, Tuple, Dict, Set, Optional, Any
@@ -13,6 +14,30 @@ from dataclasses import dataclass, field
 from enum import Enum
 
 
+# A*搜索的8方向邻居偏移，模块加载时构建一次
+_NEIGHBOR_OFFSETS: Tuple[Tuple[int, int], ...] = (
+    (-1, -1), (-1, 0), (-1, 1),
+    (0, -1),           (0, 1),
+    (1, -1),  (1, 0),  (1, 1)
+)
+
+
+# 相邻格移动代价，按平方距离索引：基础代价为欧氏距离，对角线移动再乘以1.414
+_MOVE_COST_BY_DIST_SQ: Dict[int, float] = {
+    1: 1.0,
+    2: math.sqrt(2) * 1.414,
+}
+
+# A*展开邻居时直接使用的 (dx, dy, 移动代价)
+_NEIGHBOR_STEPS: Tuple[Tuple[int, int, float], ...] = tuple(
+    (dx, dy, _MOVE_COST_BY_DIST_SQ[dx * dx + dy * dy]) for dx, dy in _NEIGHBOR_OFFSETS
+)
+
+
+# A*结果缓存的最大条目数，超出时整体清空
+_PATH_CACHE_SIZE = 256
+
+
 class CellType(Enum):
     """网格单元类型"""
     FREE = "free"           # 空闲区域
@@ -45,7 +70,7 @@ class Position:
     
     def distance_to(self, other: 'Position') -> float:
         """计算到另一个位置的距离"""
-        return math.sqrt((self.x - other.x)**2 + (self.y - other.y)**2)
+        return math.hypot(self.x - other.x, self.y - other.y)
     
     def manhattan_distance_to(self, other: 'Position') -> int:
         """计算曼哈顿距离"""
@@ -64,19 +89,6 @@ class RobotState:
     safe_radius: int = 25  # 安全半径(毫米) - 对应50mm边长正方形
 
 
-@dataclass
-class PathNode:
-    """A*算法路径节点"""
-    position: Position
-    g_cost: float = 0  # 从起点到当前节点的实际代价
-    h_cost: float = 0  # 从当前节点到终点的启发式代价
-    f_cost: float = 0  # 总代价 f = g + h
-    parent: Optional['PathNode'] = None
-    
-    def __lt__(self, other):
-        return self.f_cost < other.f_cost
-
-
 class CollisionAvoidanceSystem:
     """toio机器人避障系统"""
     
@@ -99,6 +111,10 @@ class CollisionAvoidanceSystem:
         self.grid_width = (self.mat_max_x - self.mat_min_x) // grid_size
         self.grid_height = (self.mat_max_y - self.mat_min_y) // grid_size
         
+        # world_to_grid的裁剪上界，只计算一次
+        self._grid_max_x = self.grid_width - 1
+        self._grid_max_y = self.grid_height - 1
+        
         # 初始化网格地图
         self.grid: List[List[GridCell]] = []
         self._initialize_grid()
@@ -107,6 +123,11 @@ class CollisionAvoidanceSystem:
         self.robots: Dict[str, RobotState] = {}
         self.robot_lock = threading.RLock()
         
+        # 网格占用每变化一次版本号加一；A*结果只在同一版本内复用
+        self._grid_version = 0
+        self._path_cache: Dict[Tuple[str, Tuple[int, int], Tuple[int, int]], List[Position]] = {}
+        self._path_cache_version = 0
+        
         # 静态障碍物定义（厨房边界等）
         self._setup_static_obstacles()
         
@@ -133,8 +154,9 @@ class CollisionAvoidanceSystem:
         grid_y = (world_y - self.mat_min_y) // self.grid_size
         
         # 边界检查
-        grid_x = max(0, min(grid_x, self.grid_width - 1))
-        grid_y = max(0, min(grid_y, self.grid_height - 1))
+        max_x, max_y = self._grid_max_x, self._grid_max_y
+        grid_x = 0 if grid_x < 0 else max_x if grid_x > max_x else grid_x
+        grid_y = 0 if grid_y < 0 else max_y if grid_y > max_y else grid_y
         
         return grid_x, grid_y
     
@@ -153,7 +175,9 @@ class CollisionAvoidanceSystem:
             if robot_id in self.robots:
                 # 清除旧位置
                 old_pos = self.robots[robot_id].position
-                self._clear_robot_from_grid(robot_id, old_pos)
+                cleared = self._clear_robot_from_grid(robot_id, old_pos)
+                if old_pos != new_position:
+                    self._grid_version += 1
                 
                 # 更新位置
                 self.robots[robot_id].position = new_position
@@ -164,35 +188,68 @@ class CollisionAvoidanceSystem:
                     id=robot_id,
                     position=new_position
                 )
+                cleared = set()
+                self._grid_version += 1
             
-            # 在网格中标记新位置
-            self._mark_robot_on_grid(robot_id, new_position)
+            # 在网格中标记新位置（位置不变时也可能占用到其他机器人刚让出的格子）
+            self._mark_robot_on_grid(robot_id, new_position, cleared)
     
-    def _clear_robot_from_grid(self, robot_id: str, position: Position):
-        """从网格中清除机器人标记"""
+    def _footprint_ranges(self, robot_id: str, position: Position) -> Tuple[range, range]:
+        """
+        机器人占位正方形覆盖的网格行列范围
+        
+        一次性裁剪到地图边界，循环内无需逐格做边界判断
+        """
         safe_radius_cells = self.robots[robot_id].safe_radius // self.grid_size
+        x_range = range(max(0, position.x - safe_radius_cells),
+                        min(self.grid_width, position.x + safe_radius_cells + 1))
+        y_range = range(max(0, position.y - safe_radius_cells),
+                        min(self.grid_height, position.y + safe_radius_cells + 1))
+        return x_range, y_range
+    
+    def _clear_robot_from_grid(self, robot_id: str, position: Position) -> Set[Tuple[int, int]]:
+        """
+        从网格中清除机器人标记
+        
+        Returns:
+            被清除的网格坐标集合
+        """
+        x_range, y_range = self._footprint_ranges(robot_id, position)
+        cleared = set()
         
-        for dy in range(-safe_radius_cells, safe_radius_cells + 1):
-            for dx in range(-safe_radius_cells, safe_radius_cells + 1):
-                gx, gy = position.x + dx, position.y + dy
-                if 0 <= gx < self.grid_width and 0 <= gy < self.grid_height:
-                    cell = self.grid[gy][gx]
-                    if cell.robot_id == robot_id:
-                        cell.cell_type = CellType.FREE
-                        cell.robot_id = None
+        for gy in y_range:
+            row = self.grid[gy]
+            for gx in x_range:
+                cell = row[gx]
+                if cell.robot_id == robot_id:
+                    cell.cell_type = CellType.FREE
+                    cell.robot_id = None
+                    cleared.add((gx, gy))
+        return cleared
     
-    def _mark_robot_on_grid(self, robot_id: str, position: Position):
-        """在网格中标记机器人位置"""
-        safe_radius_cells = self.robots[robot_id].safe_radius // self.grid_size
+    def _mark_robot_on_grid(self, robot_id: str, position: Position,
+                            cleared: Set[Tuple[int, int]] = frozenset()):
+        """
+        在网格中标记机器人位置
         
-        for dy in range(-safe_radius_cells, safe_radius_cells + 1):
-            for dx in range(-safe_radius_cells, safe_radius_cells + 1):
-                gx, gy = position.x + dx, position.y + dy
-                if 0 <= gx < self.grid_width and 0 <= gy < self.grid_height:
-                    cell = self.grid[gy][gx]
-                    if cell.cell_type == CellType.FREE:
-                        cell.cell_type = CellType.ROBOT
-                        cell.robot_id = robot_id
+        cleared为调用方刚清除的该机器人的格子；占用了这些格子以外的空闲格子时
+        网格占用发生了实际变化，网格版本加一，使缓存的路径失效
+        """
+        x_range, y_range = self._footprint_ranges(robot_id, position)
+        changed = False
+        
+        for gy in y_range:
+            row = self.grid[gy]
+            for gx in x_range:
+                cell = row[gx]
+                if cell.cell_type == CellType.FREE:
+                    cell.cell_type = CellType.ROBOT
+                    cell.robot_id = robot_id
+                    if (gx, gy) not in cleared:
+                        changed = True
+        
+        if changed:
+            self._grid_version += 1
     
     def plan_path(self, robot_id: str, start_world: Tuple[int, int], 
                   goal_world: Tuple[int, int]) -> List[Tuple[int, int]]:
@@ -215,27 +272,25 @@ class CollisionAvoidanceSystem:
         goal_pos = Position(goal_grid[0], goal_grid[1])
         
         # 临时清除当前机器人的占用标记（允许经过自己的位置）
+        cleared = set()
         with self.robot_lock:
             if robot_id in self.robots:
-                self._clear_robot_from_grid(robot_id, self.robots[robot_id].position)
+                cleared = self._clear_robot_from_grid(robot_id, self.robots[robot_id].position)
         
         try:
-            # 执行A*搜索
-            path_nodes = self._astar_search(start_pos, goal_pos, robot_id)
+            # 执行A*搜索（网格未变化时复用上次的结果）
+            path_positions = self._search_path(robot_id, start_grid, goal_grid, start_pos, goal_pos)
             
-            if not path_nodes:
+            if not path_positions:
                 print(f"⚠️ 无法为 {robot_id} 找到从 {start_world} 到 {goal_world} 的路径")
                 return []
             
             # 转换为世界坐标
-            world_path = []
-            for node in path_nodes:
-                world_x, world_y = self.grid_to_world(node.position.x, node.position.y)
-                world_path.append((world_x, world_y))
+            world_path = [self.grid_to_world(position.x, position.y) for position in path_positions]
             
             # 更新机器人路径
             if robot_id in self.robots:
-                self.robots[robot_id].path = [node.position for node in path_nodes]
+                self.robots[robot_id].path = list(path_positions)
                 self.robots[robot_id].target = goal_pos
             
             print(f"🗺️ 为 {robot_id} 规划路径: {len(world_path)} 个路径点")
@@ -245,74 +300,97 @@ class CollisionAvoidanceSystem:
             # 恢复机器人占用标记
             with self.robot_lock:
                 if robot_id in self.robots:
-                    self._mark_robot_on_grid(robot_id, self.robots[robot_id].position)
+                    self._mark_robot_on_grid(robot_id, self.robots[robot_id].position, cleared)
     
-    def _astar_search(self, start: Position, goal: Position, robot_id: str) -> List[PathNode]:
-        """A*搜索算法实现"""
-        open_list = []
-        closed_set = set()
+    def _search_path(self, robot_id: str, start_grid: Tuple[int, int], goal_grid: Tuple[int, int],
+                     start: Position, goal: Position) -> List[Position]:
+        """
+        返回A*路径的网格位置序列
+        
+        A*结果只取决于起终点、机器人ID和网格占用，网格版本未变时直接复用缓存；
+        搜索期间网格发生变化的结果不写入缓存
+        """
+        version = self._grid_version
+        if self._path_cache_version != version:
+            self._path_cache = {}
+            self._path_cache_version = version
+        
+        key = (robot_id, start_grid, goal_grid)
+        cached = self._path_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        positions = self._astar_search(start, goal, robot_id)
+        
+        if self._grid_version == version:
+            if len(self._path_cache) >= _PATH_CACHE_SIZE:
+                self._path_cache.clear()
+            self._path_cache[key] = positions
+        return positions
+    
+    def _astar_search(self, start: Position, goal: Position, robot_id: str) -> List[Position]:
+        """
+        A*搜索算法实现
         
-        # 创建起始节点
-        start_node = PathNode(position=start)
-        start_node.g_cost = 0
-        start_node.h_cost = start.manhattan_distance_to(goal)
-        start_node.f_cost = start_node.g_cost + start_node.h_cost
+        搜索过程中节点用 (x, y) 元组表示，开放列表条目为 (f, h, 序号, g, x, y)：
+        f相同时优先展开离目标更近的节点；只有找到更小的g值时才入堆。
         
-        heapq.heappush(open_list, start_node)
+        Returns:
+            从起点到终点的位置序列，未找到路径时为空列表
+        """
+        grid = self.grid
+        width, height = self.grid_width, self.grid_height
+        goal_x, goal_y = goal.x, goal.y
+        obstacle, robot = CellType.OBSTACLE, CellType.ROBOT
+        heappush, heappop = heapq.heappush, heapq.heappop
+        seq = itertools.count()
+        
+        start_xy = (start.x, start.y)
+        start_h = abs(start.x - goal_x) + abs(start.y - goal_y)
+        open_list = [(start_h, start_h, next(seq), 0.0, start.x, start.y)]
+        best_g: Dict[Tuple[int, int], float] = {start_xy: 0.0}
+        parents: Dict[Tuple[int, int], Optional[Tuple[int, int]]] = {start_xy: None}
+        closed_set = set()
         
         while open_list:
-            current_node = heapq.heappop(open_list)
+            _, _, _, g, x, y = heappop(open_list)
+            node = (x, y)
             
-            if current_node.position in closed_set:
+            if node in closed_set:
                 continue
-                
-            closed_set.add(current_node.position)
+            closed_set.add(node)
             
             # 到达目标
-            if current_node.position == goal:
-                return self._reconstruct_path(current_node)
+            if x == goal_x and y == goal_y:
+                return self._reconstruct_path(parents, node)
             
             # 检查邻居节点
-            for neighbor_pos in self._get_neighbors(current_node.position):
-                if neighbor_pos in closed_set:
+            for dx, dy, move_cost in _NEIGHBOR_STEPS:
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < width and 0 <= ny < height):
                     continue
-                
-                # 检查是否可通行
-                if not self._is_passable(neighbor_pos, robot_id):
+                neighbor = (nx, ny)
+                if neighbor in closed_set:
                     continue
                 
-                # 计算代价
-                move_cost = self._get_move_cost(current_node.position, neighbor_pos)
-                tentative_g_cost = current_node.g_cost + move_cost
+                # 障碍物或其他机器人占用的格子不可通行
+                cell = grid[ny][nx]
+                cell_type = cell.cell_type
+                if cell_type is obstacle or (cell_type is robot and cell.robot_id != robot_id):
+                    continue
                 
-                # 创建邻居节点
-                neighbor_node = PathNode(position=neighbor_pos)
-                neighbor_node.g_cost = tentative_g_cost
-                neighbor_node.h_cost = neighbor_pos.manhattan_distance_to(goal)
-                neighbor_node.f_cost = neighbor_node.g_cost + neighbor_node.h_cost
-                neighbor_node.parent = current_node
+                tentative_g = g + move_cost
+                if tentative_g >= best_g.get(neighbor, math.inf):
+                    continue
+                best_g[neighbor] = tentative_g
+                parents[neighbor] = node
                 
-                heapq.heappush(open_list, neighbor_node)
+                h = abs(nx - goal_x) + abs(ny - goal_y)
+                heappush(open_list, (tentative_g + h, h, next(seq), tentative_g, nx, ny))
         
         # 未找到路径
         return []
     
-    def _get_neighbors(self, position: Position) -> List[Position]:
-        """获取邻居位置（8方向）"""
-        neighbors = []
-        directions = [
-            (-1, -1), (-1, 0), (-1, 1),
-            (0, -1),           (0, 1),
-            (1, -1),  (1, 0),  (1, 1)
-        ]
-        
-        for dx, dy in directions:
-            new_x, new_y = position.x + dx, position.y + dy
-            if 0 <= new_x < self.grid_width and 0 <= new_y < self.grid_height:
-                neighbors.append(Position(new_x, new_y))
-        
-        return neighbors
-    
     def _is_passable(self, position: Position, robot_id: str) -> bool:
         """检查位置是否可通行"""
         if not (0 <= position.x < self.grid_width and 0 <= position.y < self.grid_height):
@@ -330,25 +408,15 @@ class CollisionAvoidanceSystem:
         
         return True
     
-    def _get_move_cost(self, from_pos: Position, to_pos: Position) -> float:
-        """计算移动代价"""
-        # 基础移动代价
-        base_cost = from_pos.distance_to(to_pos)
-        
-        # 对角线移动代价更高
-        if abs(from_pos.x - to_pos.x) == 1 and abs(from_pos.y - to_pos.y) == 1:
-            base_cost *= 1.414  # sqrt(2)
-        
-        return base_cost
-    
-    def _reconstruct_path(self, goal_node: PathNode) -> List[PathNode]:
-        """重构路径"""
+    def _reconstruct_path(self, parents: Dict[Tuple[int, int], Optional[Tuple[int, int]]],
+                          goal: Tuple[int, int]) -> List[Position]:
+        """沿父节点回溯重构路径"""
         path = []
-        current = goal_node
+        current = goal
         
-        while current:
-            path.append(current)
-            current = current.parent
+        while current is not None:
+            path.append(Position(current[0], current[1]))
+            current = parents[current]
         
         path.reverse()
         return path
@@ -416,4 +484,5 @@ class CollisionAvoidanceSystem:
                 robot = self.robots[robot_id]
                 self._clear_robot_from_grid(robot_id, robot.position)
                 del self.robots[robot_id]
+                self._grid_version += 1
                 print(f"🗑️ 清除机器人 {robot_id} 的避障数据")
\ No newline at end of file
@@ -1,8 +1,14 @@
 import asyncio
+import concurrent.futures
+import functools
+import logging
+import math
 import threading
 import time
-from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass
+import weakref
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
 from enum import Enum
 
 # 使用绝对导入来引用已安装的toio库，避免与本地toio/目录冲突
@@ -19,8 +25,7 @@ try:
     from toio.cube.api.id_information import PositionId
     from toio.cube.api.motor import (
         MovementType, Speed, SpeedChangeType, TargetPosition, CubeLocation, 
-        Point, RotationOption, ResponseMotorControlTarget, MotorResponseCode,
-        ResponseMotorControlMultipleTargets
+        Point, RotationOption, ResponseMotorControlTarget, MotorResponseCode
     )
     from toio.cube.api.indicator import IndicatorParam, Color
 except ImportError as e:
@@ -28,89 +33,179 @@ except ImportError as e:
     print("❌ 请确保已正确安装toio.py: pip install toio-py")
     raise
 
+log = logging.getLogger(__name__)
 
-@dataclass
+# 避障系统组件是可选的，导入失败时控制器仍可直接移动
+try:
+    from .collision_avoidance import CollisionAvoidanceSystem
+    from .position_tracker import PositionTracker
+    from .path_planner import PathPlanner, PlanningPriority
+    _HAVE_AVOIDANCE = True
+except ImportError as e:
+    _AVOIDANCE_IMPORT_ERROR = e
+    _HAVE_AVOIDANCE = False
+
+# Speed profile for every move; toio.py only serializes it, so one instance is shared
+_MOVE_SPEED = Speed(
+    max=115,  # Slightly faster for more reliable movement
+    speed_change_type=SpeedChangeType.AccelerationAndDeceleration
+)
+
+# Approximate travel speed of a real cube at _MOVE_SPEED, used to pace simulated moves
+_SIM_SPEED_MM_PER_S = 300.0
+
+# Default cap on concurrent GATT writes across all cubes; bursts beyond the
+# BLE stack's flow-control credits stall every cube instead of queuing
+_MAX_INFLIGHT_WRITES = 4
+
+
+@dataclass(slots=True, eq=False)
 class CubeState:
     """Holds the current state of a Toio cube"""
     id: str
     cube: ToioCoreCube
     position: Optional[CubeLocation] = None
     connected: bool = True
+    # (x, y) of position, kept alongside it so readers skip position.point.x/y
+    position_xy: Optional[Tuple[int, int]] = None
+    # Serializes BLE commands that wait for a response on this cube
+    cmd_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # Set by the motor notification handler once motor_result is filled in
+    motor_result_event: asyncio.Event = field(default_factory=asyncio.Event)
+    motor_result: Optional[bool] = None
+    
+    def __post_init__(self):
+        if self.position is not None and self.position_xy is None:
+            self.position_xy = (self.position.point.x, self.position.point.y)
+    
+    def update_position(self, location: CubeLocation) -> bool:
+        """
+        Store a new location together with its cached (x, y) pair.
+        
+        Returns True if the (x, y) point changed.
+        """
+        self.position = location
+        # A resting cube keeps reporting the same point; reuse the old tuple then
+        point = location.point
+        xy = self.position_xy
+        if xy is None or xy[0] != point.x or xy[1] != point.y:
+            self.position_xy = (point.x, point.y)
+            return True
+        return False
+
+
+if sys.version_info >= (3, 11):
+    async def _wait_with_timeout(aw, timeout: float):
+        """Await with a deadline; asyncio.timeout reschedules one timer instead of wrapping a task"""
+        async with asyncio.timeout(timeout):
+            return await aw
+else:
+    _wait_with_timeout = asyncio.wait_for
+
 
+def _copy_task_outcome(future: concurrent.futures.Future, task: asyncio.Task):
+    """Copy an asyncio task's outcome onto the caller's concurrent future"""
+    if future.cancelled():
+        return
+    try:
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+    except concurrent.futures.InvalidStateError:
+        # The caller cancelled the future concurrently
+        pass
+
+
+def _cancel_task_with_future(loop: asyncio.AbstractEventLoop, task: asyncio.Task,
+                             future: concurrent.futures.Future):
+    """Propagate a caller-side cancel to the task running on the loop"""
+    if future.cancelled() and not loop.is_closed():
+        loop.call_soon_threadsafe(task.cancel)
+
+
+def _disconnect_on_exit(loop: asyncio.AbstractEventLoop, cubes: Dict[str, CubeState]):
+    """Disconnect cubes left open by a ToioController that was never closed"""
+    if not loop.is_running():
+        return
+    
+    async def disconnect_all():
+        for cube_state in list(cubes.values()):
+            if cube_state.connected and cube_state.cube is not None:
+                await cube_state.cube.disconnect()
+    
+    future = asyncio.run_coroutine_threadsafe(disconnect_all(), loop)
+    try:
+        future.result(timeout=2.0)
+    except Exception as e:
+        print(f"Warning: Error disconnecting cubes at exit: {e}")
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
 
-class ToioController:
+
+class ToioControllerAsync:
     """
-    A synchronous controller for toio core cubes that abstracts away the 
-    asyncio-based toio-py library.
+    asyncio-native core shared by ToioController and AsyncToioController.
+    
+    Every coroutine here must run on the event loop that owns the cubes'
+    BLE connections.
     """
     
-    def __init__(self, num_cubes: int = 1, connect_timeout: float = 10.0, enable_collision_avoidance: bool = True):
-        """
-        Initialize the controller and connect to the specified number of cubes.
-        
-        Args:
-            num_cubes: Number of cubes to connect to
-            connect_timeout: Timeout in seconds for the connection process
-            enable_collision_avoidance: Whether to enable collision avoidance system
-        """
+    def _init_cube_registry(self, max_inflight: int = _MAX_INFLIGHT_WRITES):
+        """Initialize the per-cube bookkeeping shared by both controllers"""
         self._cubes: Dict[str, CubeState] = {}
-        self._event_loop = None
-        self._thread = None
-        self._running = False
+        # Bounds concurrent BLE writes (moves, LEDs, sounds); stops bypass it
+        self._write_sem = asyncio.Semaphore(max_inflight)
         self._position_callbacks = {}
-        self._motor_callbacks = {}
-        
-        # 避障系统组件
-        self._collision_avoidance = None
-        self._position_tracker = None
-        self._path_planner = None
-        self._avoidance_enabled = enable_collision_avoidance
-        
-        # Start the background thread with async event loop
-        self._start_background_loop()
-        
-        # Connect to cubes
-        try:
-            self._connect_cubes(num_cubes, connect_timeout)
-        except Exception as e:
-            print(f"Warning: Failed to connect to cubes: {e}")
-            print("Controller will continue in simulation mode.")
-            # Create simulated cubes for testing without real hardware
-            self._create_simulated_cubes(num_cubes)
-        
-        # 初始化避障系统
-        if self._avoidance_enabled:
-            self._setup_collision_avoidance()
-        
-    def _start_background_loop(self):
-        """Start a background thread with an asyncio event loop"""
-        self._running = True
-        
-        def run_event_loop():
-            """Run the event loop in the background thread"""
-            asyncio.set_event_loop(asyncio.new_event_loop())
-            self._event_loop = asyncio.get_event_loop()
-            
-            async def keep_running():
-                while self._running:
-                    await asyncio.sleep(0.1)
-            
-            self._event_loop.run_until_complete(keep_running())
-            
-        self._thread = threading.Thread(target=run_event_loop, daemon=True)
-        self._thread.start()
+        # Read-only view of connected cubes, rebuilt only when the registry changes
+        self._connected_view: Optional[MappingProxyType] = None
+        # Called with (cube_id, x, y) whenever a cube's point changes. The tuple
+        # is replaced, never mutated, so notifiers iterate it without locking.
+        self._position_listeners: Tuple[Callable[[str, int, int], None], ...] = ()
+        self._listeners_lock = threading.Lock()
+    
+    def _register_cube(self, cube_state: CubeState):
+        """Add a cube to the registry and invalidate the connected view"""
+        self._cubes[cube_state.id] = cube_state
+        self._connected_view = None
+    
+    def add_position_listener(self, listener: Callable[[str, int, int], None]):
+        """
+        Register a callback for position changes.
         
-        # Wait for event loop to be ready
-        while self._event_loop is None:
-            time.sleep(0.1)
+        The listener is called with (cube_id, x, y) only when a cube's point
+        actually changes, on the thread that received the update (the event
+        loop for BLE notifications), so it must be quick and thread-safe.
+        """
+        with self._listeners_lock:
+            self._position_listeners = self._position_listeners + (listener,)
+    
+    def remove_position_listener(self, listener: Callable[[str, int, int], None]):
+        """Unregister a callback added with add_position_listener"""
+        with self._listeners_lock:
+            self._position_listeners = tuple(
+                cb for cb in self._position_listeners if cb != listener
+            )
+    
+    def _notify_position(self, cube_state: CubeState):
+        """Pass a cube's new point to every position listener"""
+        x, y = cube_state.position_xy
+        for listener in self._position_listeners:
+            try:
+                listener(cube_state.id, x, y)
+            except Exception as e:
+                log.error("Position listener failed for %s: %s", cube_state.id, e)
     
     def _create_simulated_cubes(self, num_cubes: int):
         """Create simulated cubes for testing without real hardware"""
         for i in range(num_cubes):
             cube_id = f"sim_cube_{i+1}"
             # Use a mock cube (None) that won't try to connect
-            self._cubes[cube_id] = self._create_simulated_cube(cube_id)
-            print(f"Created simulated cube: {cube_id}")
+            self._register_cube(self._create_simulated_cube(cube_id))
+        if num_cubes > 0:
+            print(f"Created {num_cubes} simulated cubes: sim_cube_1..sim_cube_{num_cubes}")
             
     def _create_simulated_cube(self, cube_id: str) -> CubeState:
         """Create a single simulated cube"""
@@ -122,23 +217,6 @@ class ToioController:
             connected=True
         )
     
-    def _connect_cubes(self, num_cubes: int, timeout: float = 10.0):
-        """Connect to the specified number of cubes"""
-        if num_cubes <= 0:
-            return
-        
-        future = asyncio.run_coroutine_threadsafe(
-            self._async_connect_cubes(num_cubes, timeout), self._event_loop
-        )
-        
-        try:
-            # Wait for the connection to complete with timeout
-            future.result(timeout=timeout + 5.0)  # Add 5 seconds to the scan timeout
-        except Exception as e:
-            # Cancel the future if it's still running
-            future.cancel()
-            raise e
-    
     async def _async_connect_cubes(self, num_cubes: int, timeout: float = 10.0):
         """Asynchronously connect to the specified number of cubes"""
         print(f"Scanning for {num_cubes} toio cubes...")
@@ -153,42 +231,64 @@ class ToioController:
             if len(dev_list) < num_cubes:
                 print(f"Warning: Only found {len(dev_list)} cubes out of {num_cubes} requested")
             
-            # Connect to each cube
-            for i, device in enumerate(dev_list[:num_cubes]):
-                cube_id = f"cube_{i+1}"
-                
-                try:
-                    cube = ToioCoreCube(device.interface)
-                    await cube.connect()
-                    
-                    # Create cube state
-                    self._cubes[cube_id] = CubeState(id=cube_id, cube=cube)
+            # Connect to all cubes concurrently; BLE connect is latency-bound
+            cube_ids = [f"cube_{i+1}" for i in range(len(dev_list[:num_cubes]))]
+            results = await asyncio.gather(
+                *(self._connect_one(cube_id, device)
+                  for cube_id, device in zip(cube_ids, dev_list)),
+                return_exceptions=True
+            )
+            
+            # Register in scan order so cube IDs map to chefs deterministically
+            for cube_id, result in zip(cube_ids, results):
+                if isinstance(result, BaseException):
+                    print(f"Failed to connect to {cube_id}: {result}")
+                else:
+                    self._register_cube(result)
                     print(f"Connected to cube: {cube_id}")
-                    
-                    # Set up position notification handler
-                    await self._setup_position_tracking(cube_id, cube)
-                except Exception as e:
-                    print(f"Failed to connect to {cube_id}: {e}")
         
         except Exception as e:
             print(f"Error during cube discovery: {e}")
             raise
     
-    async def _setup_position_tracking(self, cube_id: str, cube: ToioCoreCube):
+    async def _connect_one(self, cube_id: str, device) -> CubeState:
+        """Connect a single scanned device and set up its notification handlers"""
+        cube = ToioCoreCube(device.interface)
+        await cube.connect()
+        
+        cube_state = CubeState(id=cube_id, cube=cube)
+        try:
+            # Set up position notification handler
+            await self._setup_position_tracking(cube_state)
+        except BaseException:
+            # The cube never gets registered, so nothing else would release its link
+            self._position_callbacks.pop(cube_id, None)
+            try:
+                await cube.disconnect()
+            except Exception as e:
+                log.warning("Error disconnecting %s after failed setup: %s", cube_id, e)
+            raise
+        return cube_state
+    
+    async def _setup_position_tracking(self, cube_state: CubeState):
         """Set up position tracking for a cube"""
+        cube = cube_state.cube
         if cube is None:  # Skip for simulated cubes
             return
-            
+        
+        # The callbacks close over this cube's state directly, so a
+        # notification never has to look the cube up by its string ID
+        update_position = cube_state.update_position
+        
         # Create a callback for this specific cube
         async def position_callback(payload: bytearray):
             id_info = IdInformation.is_my_data(payload)
             if isinstance(id_info, PositionId):
-                cube_state = self._cubes.get(cube_id)
-                if cube_state:
-                    cube_state.position = id_info.center
+                if update_position(id_info.center) and self._position_listeners:
+                    self._notify_position(cube_state)
         
         # Store the callback for later cleanup
-        self._position_callbacks[cube_id] = position_callback
+        self._position_callbacks[cube_state.id] = position_callback
         
         # Register the notification handler
         await cube.api.id_information.register_notification_handler(position_callback)
@@ -197,38 +297,17 @@ class ToioController:
         async def motor_callback(payload: bytearray):
             motor_response = cube.api.motor.is_my_data(payload)
             if isinstance(motor_response, ResponseMotorControlTarget):
-                # Store the success/failure for the most recent move command
-                if cube_id in self._motor_callbacks:
-                    # Success if response code is SUCCESS (0x00) or SUCCESS_WITH_OVERWRITE (0x05)
-                    self._motor_callbacks[cube_id] = (
-                        motor_response.response_code == MotorResponseCode.SUCCESS or
-                        motor_response.response_code == MotorResponseCode.SUCCESS_WITH_OVERWRITE
-                    )
+                # Success if response code is SUCCESS (0x00) or SUCCESS_WITH_OVERWRITE (0x05)
+                cube_state.motor_result = (
+                    motor_response.response_code == MotorResponseCode.SUCCESS or
+                    motor_response.response_code == MotorResponseCode.SUCCESS_WITH_OVERWRITE
+                )
+                # Wake up the coroutine waiting on this move
+                cube_state.motor_result_event.set()
         
         # Register the motor notification handler
         await cube.api.motor.register_notification_handler(motor_callback)
     
-    def close(self):
-        """Disconnect from all cubes and shut down the controller"""
-        if not self._running:
-            return
-        
-        try:
-            future = asyncio.run_coroutine_threadsafe(
-                self._async_close(), self._event_loop
-            )
-            
-            # Wait for disconnection to complete with a timeout
-            future.result(timeout=5.0)
-        except Exception as e:
-            print(f"Warning: Error during disconnect: {e}")
-        finally:
-            # Stop the background thread
-            self._running = False
-            if self._thread:
-                self._thread.join(timeout=2.0)
-                self._thread = None
-    
     async def _async_close(self):
         """Asynchronously disconnect from all cubes"""
         for cube_id, cube_state in self._cubes.items():
@@ -250,19 +329,340 @@ class ToioController:
         
         self._cubes.clear()
         self._position_callbacks.clear()
-        self._motor_callbacks.clear()
+        self._connected_view = None
     
     def get_cubes(self) -> Dict[str, CubeState]:
-        """Return a dictionary of connected cubes"""
-        return {
-            cube_id: cube_state 
-            for cube_id, cube_state in self._cubes.items() 
-            if cube_state.connected
-        }
+        """Return a read-only mapping of connected cubes"""
+        view = self._connected_view
+        if view is None:
+            view = self._connected_view = MappingProxyType({
+                cube_id: cube_state 
+                for cube_id, cube_state in self._cubes.items() 
+                if cube_state.connected
+            })
+        return view
     
     def get_cube_ids(self) -> List[str]:
         """Return a list of connected cube IDs"""
-        return list(self.get_cubes().keys())
+        return list(self.get_cubes())
+    
+    def _require_cube(self, cube_id: str, quiet: bool = False) -> Optional[CubeState]:
+        """Return the connected cube's state, or None (logging unless quiet)"""
+        cube_state = self._cubes.get(cube_id)
+        if cube_state is not None and cube_state.connected:
+            return cube_state
+        if not quiet:
+            log.warning("Cube %s not found or not connected", cube_id)
+        return None
+    
+    def get_position(self, cube_id: str) -> Optional[CubeLocation]:
+        """
+        Get the current position of a cube.
+        
+        Args:
+            cube_id: ID of the cube
+            
+        Returns:
+            Current position of the cube, or None if unknown
+        """
+        cube_state = self._require_cube(cube_id)
+        if cube_state is None:
+            return None
+        
+        return cube_state.position
+    
+    def get_position_xy(self, cube_id: str) -> Optional[Tuple[int, int]]:
+        """
+        Return the last known (x, y) of a cube without building a CubeLocation.
+        
+        The notification handler replaces the tuple in one assignment, so
+        this is safe to call from any thread without locking.
+        """
+        cube_state = self._cubes.get(cube_id)
+        if cube_state is None or not cube_state.connected:
+            return None
+        return cube_state.position_xy
+    
+    def get_all_positions(self) -> Dict[str, Tuple[int, int]]:
+        """Return the last known (x, y) of every connected cube with a position"""
+        return {
+            cube_id: cube_state.position_xy
+            for cube_id, cube_state in self._cubes.items()
+            if cube_state.connected and cube_state.position_xy is not None
+        }
+    
+    def _simulate_move(self, cube_state: CubeState, x: int, y: int, angle: int) -> float:
+        """
+        Move a simulated cube instantly and return how long the move would take.
+        
+        The travel time is distance / _SIM_SPEED_MM_PER_S scaled by
+        sim_move_delay, so the default of 0 makes simulated moves instant.
+        """
+        log.debug("Simulating movement of %s to (%s, %s, %s°)", cube_state.id, x, y, angle)
+        delay = 0.0
+        if self.sim_move_delay and cube_state.position_xy is not None:
+            old_x, old_y = cube_state.position_xy
+            delay = self.sim_move_delay * math.hypot(x - old_x, y - old_y) / _SIM_SPEED_MM_PER_S
+        if cube_state.update_position(CubeLocation(point=Point(x=x, y=y), angle=angle)):
+            self._notify_position(cube_state)
+        return delay
+    
+    async def _async_move_to(
+        self, 
+        cube: ToioCoreCube, 
+        x: int, 
+        y: int, 
+        angle: int, 
+        movement_type: MovementType
+    ):
+        """Asynchronously move a cube to the specified position"""
+        async with self._write_sem:
+            await cube.api.motor.motor_control_target(
+                timeout=5,  # 5 second timeout
+                movement_type=movement_type,
+                speed=_MOVE_SPEED,
+                target=TargetPosition(
+                    cube_location=CubeLocation(
+                        point=Point(x=x, y=y), 
+                        angle=angle
+                    ),
+                    rotation_option=RotationOption.AbsoluteOptimal,
+                ),
+            )
+    
+    async def _async_move_and_wait(
+        self,
+        cube_state: CubeState,
+        x: int,
+        y: int,
+        angle: int,
+        movement_type: MovementType,
+        timeout: float = 10.0
+    ) -> bool:
+        """Send a move command and wait for the cube's motor response"""
+        async with cube_state.cmd_lock:
+            cube_state.motor_result_event.clear()
+            cube_state.motor_result = None
+            
+            await self._async_move_to(cube_state.cube, x, y, angle, movement_type)
+            
+            try:
+                await _wait_with_timeout(cube_state.motor_result_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                # Timeout - assume failure
+                return False
+            
+            return bool(cube_state.motor_result)
+    
+    async def _async_move_many(
+        self,
+        moves: List[Tuple[CubeState, int, int, int]],
+        movement_type: MovementType
+    ) -> List[bool]:
+        """Run several cubes' moves concurrently and collect their results"""
+        outcomes = await asyncio.gather(
+            *(self._async_move_and_wait(cube_state, x, y, angle, movement_type)
+              for cube_state, x, y, angle in moves),
+            return_exceptions=True
+        )
+        return [outcome is True for outcome in outcomes]
+    
+    async def _async_set_led(self, cube: ToioCoreCube, r: int, g: int, b: int):
+        """Asynchronously set the LED color of a cube"""
+        color = Color(r=r, g=g, b=b)
+        indicator_param = IndicatorParam(duration_ms=0, color=color)
+        async with self._write_sem:
+            await cube.api.indicator.turn_on(indicator_param)
+    
+    async def _async_play_sound(self, cube: ToioCoreCube, sound_effect: int, volume: int = 100):
+        """Asynchronously play a sound effect on a cube"""
+        async with self._write_sem:
+            await cube.api.sound.play_sound_effect(sound_effect, volume)
+    
+    async def _async_set_led_and_sound(self, cube: ToioCoreCube, r: int, g: int, b: int,
+                                       sound_effect: int, volume: int = 100):
+        """Write the LED and sound characteristics concurrently"""
+        await asyncio.gather(
+            self._async_set_led(cube, r, g, b),
+            self._async_play_sound(cube, sound_effect, volume)
+        )
+    
+    async def _async_stop_movement(self, cube: ToioCoreCube):
+        """异步停止cube移动（不经过写入限流，急停不排队）"""
+        await cube.api.motor.motor_control(left=0, right=0)
+
+
+class ToioController(ToioControllerAsync):
+    """
+    A synchronous controller for toio core cubes that abstracts away the 
+    asyncio-based toio-py library.
+    
+    Commands are forwarded to a background event loop thread; asyncio
+    callers should use AsyncToioController instead.
+    """
+    
+    def __init__(self, num_cubes: int = 1, connect_timeout: float = 10.0, enable_collision_avoidance: bool = True,
+                 sim_move_delay: float = 0.0, max_inflight: int = _MAX_INFLIGHT_WRITES):
+        """
+        Initialize the controller and connect to the specified number of cubes.
+        
+        Args:
+            num_cubes: Number of cubes to connect to
+            connect_timeout: Timeout in seconds for the connection process
+            enable_collision_avoidance: Whether to enable collision avoidance system
+            sim_move_delay: Scale for simulated travel time (1.0 ≈ real cube
+                speed, 0 = instant; keep 0 for tests and batch simulation)
+            max_inflight: Maximum number of BLE writes in flight at once
+        """
+        self._init_cube_registry(max_inflight)
+        self.sim_move_delay = sim_move_delay
+        self._event_loop = None
+        self._thread = None
+        self._running = False
+        self._finalizer = None
+        
+        # 避障系统组件
+        self._collision_avoidance = None
+        self._position_tracker = None
+        self._path_planner = None
+        self._avoidance_enabled = enable_collision_avoidance
+        
+        # Start the background thread with async event loop
+        self._start_background_loop()
+        
+        # Connect to cubes
+        try:
+            self._connect_cubes(num_cubes, connect_timeout)
+        except Exception as e:
+            print(f"Warning: Failed to connect to cubes: {e}")
+            print("Controller will continue in simulation mode.")
+            # Create simulated cubes for testing without real hardware
+            self._create_simulated_cubes(num_cubes)
+        
+        # 初始化避障系统
+        if self._avoidance_enabled:
+            self._setup_collision_avoidance()
+        
+    def _start_background_loop(self):
+        """Start a background thread with an asyncio event loop"""
+        self._running = True
+        loop_ready = threading.Event()
+        
+        def run_event_loop():
+            """Run the event loop in the background thread"""
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            
+            # Command queue drained by a single dispatcher task (see _submit)
+            self._cmd_queue = asyncio.Queue()
+            # Strong references to dispatched tasks; the loop only keeps weak ones
+            self._inflight = set()
+            dispatcher = loop.create_task(self._dispatch_commands())
+            self._event_loop = loop
+            loop_ready.set()
+            
+            # Sleeps until there is work; close() stops it with loop.stop()
+            loop.run_forever()
+            
+            dispatcher.cancel()
+            try:
+                loop.run_until_complete(dispatcher)
+            except asyncio.CancelledError:
+                pass
+            loop.close()
+            
+        self._thread = threading.Thread(target=run_event_loop, daemon=True)
+        self._thread.start()
+        
+        # Wait for event loop to be ready
+        if not loop_ready.wait(timeout=2.0):
+            raise RuntimeError("Background event loop failed to start")
+        
+        # Safety net if close() is never called; it must not reference self.
+        # The loop thread keeps the controller alive, so in practice this runs
+        # at interpreter exit (weakref.finalize registers with atexit).
+        self._finalizer = weakref.finalize(
+            self, _disconnect_on_exit, self._event_loop, self._cubes
+        )
+    
+    def _submit(self, coro) -> concurrent.futures.Future:
+        """
+        Queue a coroutine for the event loop thread.
+        
+        Returns a future for its result; cancelling the future cancels the
+        command on the loop.
+        """
+        future = concurrent.futures.Future()
+        self._event_loop.call_soon_threadsafe(self._cmd_queue.put_nowait, (coro, future))
+        return future
+    
+    def _call(self, coro, timeout: float):
+        """Run a coroutine through the command queue and wait for its result"""
+        future = self._submit(coro)
+        try:
+            return future.result(timeout=timeout)
+        except BaseException:
+            # Don't leave a timed-out command running on the loop
+            future.cancel()
+            raise
+    
+    def _fire_and_forget(self, coro, what: str):
+        """Queue a coroutine without waiting; failures are logged, not raised"""
+        def log_failure(future: concurrent.futures.Future):
+            if not future.cancelled() and future.exception() is not None:
+                log.error("Error %s: %s", what, future.exception())
+        self._submit(coro).add_done_callback(log_failure)
+    
+    async def _dispatch_commands(self):
+        """Drain every queued command per wake-up and start each as a task"""
+        loop = asyncio.get_running_loop()
+        queue = self._cmd_queue
+        
+        while True:
+            batch = [await queue.get()]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            
+            for coro, future in batch:
+                if future.cancelled():
+                    coro.close()
+                    continue
+                task = loop.create_task(coro)
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+                task.add_done_callback(functools.partial(_copy_task_outcome, future))
+                future.add_done_callback(functools.partial(_cancel_task_with_future, loop, task))
+    
+    def _connect_cubes(self, num_cubes: int, timeout: float = 10.0):
+        """Connect to the specified number of cubes"""
+        if num_cubes <= 0:
+            return
+        
+        # Add 5 seconds to the scan timeout
+        self._call(self._async_connect_cubes(num_cubes, timeout), timeout + 5.0)
+    
+    def close(self):
+        """Disconnect from all cubes and shut down the controller"""
+        if not self._running:
+            return
+        
+        # 先停止避障线程，避免它们继续轮询正在断开的cube
+        self._teardown_collision_avoidance()
+        
+        try:
+            # Wait for disconnection to complete with a timeout
+            self._call(self._async_close(), 5.0)
+        except Exception as e:
+            print(f"Warning: Error during disconnect: {e}")
+        finally:
+            # Stop the background thread
+            self._running = False
+            if self._finalizer:
+                self._finalizer.detach()
+            self._event_loop.call_soon_threadsafe(self._event_loop.stop)
+            if self._thread:
+                self._thread.join(timeout=2.0)
+                self._thread = None
     
     def move_to(
         self, 
@@ -285,70 +685,76 @@ class ToioController:
         Returns:
             True if the move was successful, False otherwise
         """
-        cube_state = self._cubes.get(cube_id)
-        if not cube_state or not cube_state.connected:
-            print(f"Error: Cube {cube_id} not found or not connected")
+        cube_state = self._require_cube(cube_id)
+        if cube_state is None:
             return False
             
         # If this is a simulated cube, just update the position and return success
         if cube_state.cube is None:
-            print(f"Simulating movement of {cube_id} to ({x}, {y}, {angle}°)")
-            cube_state.position = CubeLocation(point=Point(x=x, y=y), angle=angle)
-            time.sleep(1)  # Simulate movement time
+            delay = self._simulate_move(cube_state, x, y, angle)
+            if delay:
+                time.sleep(delay)  # Simulate movement time
             return True
         
-        # Set up for receiving move completion status
-        self._motor_callbacks[cube_id] = None
-        
-        # Run the move command
+        # Run the move command and wait for the motor response (max 10 seconds);
+        # leave headroom for a preceding command still holding cmd_lock
         try:
-            future = asyncio.run_coroutine_threadsafe(
-                self._async_move_to(cube_state.cube, x, y, angle, movement_type),
-                self._event_loop
+            return self._call(
+                self._async_move_and_wait(cube_state, x, y, angle, movement_type), 15.0
             )
-            
-            # Wait for the move command to be sent
-            future.result(timeout=2.0)
-            
-            # Wait for move to complete (max 10 seconds)
-            for _ in range(100):
-                if cube_id in self._motor_callbacks and self._motor_callbacks[cube_id] is not None:
-                    return self._motor_callbacks[cube_id]
-                time.sleep(0.1)
-                
-            # Timeout - assume failure
-            return False
-            
         except Exception as e:
-            print(f"Error moving cube {cube_id}: {e}")
+            log.error("Error moving cube %s: %s", cube_id, e)
             return False
     
-    async def _async_move_to(
-        self, 
-        cube: ToioCoreCube, 
-        x: int, 
-        y: int, 
-        angle: int, 
-        movement_type: MovementType
-    ):
-        """Asynchronously move a cube to the specified position"""
-        await cube.api.motor.motor_control_target(
-            timeout=5,  # 5 second timeout
-            movement_type=movement_type,
-            speed=Speed(
-                max=115,  # Slightly faster for more reliable movement
-                speed_change_type=SpeedChangeType.AccelerationAndDeceleration
-            ),
-            target=TargetPosition(
-                cube_location=CubeLocation(
-                    point=Point(x=x, y=y), 
-                    angle=angle
-                ),
-                rotation_option=RotationOption.AbsoluteOptimal,
-            ),
-        )
+    def move_many(
+        self,
+        targets: Dict[str, Tuple[int, int, int]],
+        movement_type: MovementType = MovementType.Linear
+    ) -> Dict[str, bool]:
+        """
+        Move several cubes at once.
+        
+        All real-cube moves are handed to the event loop in a single call
+        and run concurrently, instead of one blocking round-trip per cube.
+        
+        Args:
+            targets: Mapping of cube ID to (x, y, angle)
+            movement_type: Type of movement (Linear, Curve, etc.)
+            
+        Returns:
+            Mapping of cube ID to whether its move was successful
+        """
+        results: Dict[str, bool] = dict.fromkeys(targets, False)
+        moves: List[Tuple[CubeState, int, int, int]] = []
+        sim_delay = 0.0
+        
+        for cube_id, (x, y, angle) in targets.items():
+            cube_state = self._require_cube(cube_id)
+            if cube_state is None:
+                continue
+            if cube_state.cube is None:
+                sim_delay = max(sim_delay, self._simulate_move(cube_state, x, y, angle))
+                results[cube_id] = True
+            else:
+                moves.append((cube_state, x, y, angle))
+        
+        if moves:
+            try:
+                outcomes = self._call(self._async_move_many(moves, movement_type), 15.0)
+            except Exception as e:
+                log.error("Error moving cubes: %s", e)
+                outcomes = [False] * len(moves)
+            
+            for (cube_state, _, _, _), success in zip(moves, outcomes):
+                results[cube_state.id] = success
+        
+        # Simulated cubes move concurrently too, so only wait for the longest move
+        if sim_delay:
+            time.sleep(sim_delay)
+        
+        return results
     
-    def set_led(self, cube_id: str, r: int, g: int, b: int):
+    def set_led(self, cube_id: str, r: int, g: int, b: int, wait: bool = False):
         """
         Set the LED color of a cube.
         
@@ -357,34 +763,29 @@ class ToioController:
             r: Red component (0-255)
             g: Green component (0-255)
             b: Blue component (0-255)
+            wait: Block until the command is written (default: fire-and-forget)
         """
-        cube_state = self._cubes.get(cube_id)
-        if not cube_state or not cube_state.connected:
-            print(f"Error: Cube {cube_id} not found or not connected")
+        cube_state = self._require_cube(cube_id)
+        if cube_state is None:
             return
             
         # If this is a simulated cube, just print the action
         if cube_state.cube is None:
-            print(f"Simulating LED color for {cube_id}: RGB({r},{g},{b})")
+            log.debug("Simulating LED color for %s: RGB(%s,%s,%s)", cube_id, r, g, b)
             return
         
-        try:
-            future = asyncio.run_coroutine_threadsafe(
-                self._async_set_led(cube_state.cube, r, g, b),
-                self._event_loop
+        if not wait:
+            self._fire_and_forget(
+                self._async_set_led(cube_state.cube, r, g, b), f"setting LED for cube {cube_id}"
             )
-            
-            future.result(timeout=2.0)
+            return
+        
+        try:
+            self._call(self._async_set_led(cube_state.cube, r, g, b), 2.0)
         except Exception as e:
-            print(f"Error setting LED for cube {cube_id}: {e}")
+            log.error("Error setting LED for cube %s: %s", cube_id, e)
     
-    async def _async_set_led(self, cube: ToioCoreCube, r: int, g: int, b: int):
-        """Asynchronously set the LED color of a cube"""
-        color = Color(r=r, g=g, b=b)
-        indicator_param = IndicatorParam(duration_ms=0, color=color)
-        await cube.api.indicator.turn_on(indicator_param)
-    
-    def play_sound(self, cube_id: str, sound_effect: int, volume: int = 100):
+    def play_sound(self, cube_id: str, sound_effect: int, volume: int = 100, wait: bool = False):
         """
         Play a sound effect on a cube.
         
@@ -392,57 +793,69 @@ class ToioController:
             cube_id: ID of the cube
             sound_effect: Sound effect ID to play
             volume: Volume level (0-255)
+            wait: Block until the command is written (default: fire-and-forget)
         """
-        cube_state = self._cubes.get(cube_id)
-        if not cube_state or not cube_state.connected:
-            print(f"Error: Cube {cube_id} not found or not connected")
+        cube_state = self._require_cube(cube_id)
+        if cube_state is None:
             return
             
         # If this is a simulated cube, just print the action
         if cube_state.cube is None:
-            print(f"Simulating sound effect {sound_effect} for {cube_id}")
+            log.debug("Simulating sound effect %s for %s", sound_effect, cube_id)
             return
         
-        try:
-            future = asyncio.run_coroutine_threadsafe(
+        if not wait:
+            self._fire_and_forget(
                 self._async_play_sound(cube_state.cube, sound_effect, volume),
-                self._event_loop
+                f"playing sound for cube {cube_id}"
             )
-            
-            future.result(timeout=2.0)
+            return
+        
+        try:
+            self._call(self._async_play_sound(cube_state.cube, sound_effect, volume), 2.0)
         except Exception as e:
-            print(f"Error playing sound for cube {cube_id}: {e}")
+            log.error("Error playing sound for cube %s: %s", cube_id, e)
     
-    async def _async_play_sound(self, cube: ToioCoreCube, sound_effect: int, volume: int = 100):
-        """Asynchronously play a sound effect on a cube"""
-        await cube.api.sound.play_sound_effect(sound_effect, volume)
-    
-    def get_position(self, cube_id: str) -> Optional[CubeLocation]:
+    def set_led_and_sound(self, cube_id: str, r: int, g: int, b: int,
+                          sound_effect: int, volume: int = 100):
         """
-        Get the current position of a cube.
+        Set the LED color and play a sound effect as one queued command.
+        
+        LED and sound are separate BLE characteristics, so this cannot be one
+        write; it saves a queue hop and sends both writes concurrently.
         
         Args:
             cube_id: ID of the cube
-            
-        Returns:
-            Current position of the cube, or None if unknown
+            r, g, b: LED color components (0-255)
+            sound_effect: Sound effect ID to play
+            volume: Volume level (0-255)
         """
-        cube_state = self._cubes.get(cube_id)
-        if not cube_state or not cube_state.connected:
-            print(f"Error: Cube {cube_id} not found or not connected")
-            return None
+        cube_state = self._require_cube(cube_id)
+        if cube_state is None:
+            return
         
-        return cube_state.position
+        if cube_state.cube is None:
+            log.debug("Simulating LED RGB(%s,%s,%s) and sound %s for %s", r, g, b, sound_effect, cube_id)
+            return
+        
+        self._fire_and_forget(
+            self._async_set_led_and_sound(cube_state.cube, r, g, b, sound_effect, volume),
+            f"setting LED and sound for cube {cube_id}"
+        )
     
     # ==================== 避障系统集成 ====================
     
     def _setup_collision_avoidance(self):
-        """设置避障系统"""
+        """设置避障系统（已存在时不重复创建）"""
+        if self._collision_avoidance is not None:
+            return
+        
+        if not _HAVE_AVOIDANCE:
+            print(f"⚠️ 无法导入避障系统组件: {_AVOIDANCE_IMPORT_ERROR}")
+            self._avoidance_enabled = False
+            return
+        
         try:
-            from .collision_avoidance import CollisionAvoidanceSystem
-            from .position_tracker import PositionTracker
-            from .path_planner import PathPlanner
-            
             # 初始化避障系统组件
             self._collision_avoidance = CollisionAvoidanceSystem(grid_size=10)
             self._position_tracker = PositionTracker(self, update_interval=0.1)
@@ -457,13 +870,21 @@ class ToioController:
             
             print("🛡️ 避障系统已启用")
             
-        except ImportError as e:
-            print(f"⚠️ 无法导入避障系统组件: {e}")
-            self._avoidance_enabled = False
         except Exception as e:
             print(f"❌ 避障系统初始化失败: {e}")
             self._avoidance_enabled = False
     
+    def _teardown_collision_avoidance(self):
+        """停止并释放避障系统组件，之后可重新调用_setup_collision_avoidance"""
+        if self._position_tracker:
+            self._position_tracker.remove_position_callback(self._on_position_update)
+            self._position_tracker.stop_tracking()
+        if self._path_planner:
+            self._path_planner.stop_planner()
+        self._collision_avoidance = None
+        self._position_tracker = None
+        self._path_planner = None
+    
     def _on_position_update(self, cube_id: str, x: int, y: int):
         """位置更新回调，同步到避障系统"""
         if self._collision_avoidance:
@@ -488,30 +909,32 @@ class ToioController:
             # 避障系统未启用，使用原始移动方法
             return self.move_to(cube_id, x, y, angle, movement_type)
         
+        if len(self._cubes) <= 1:
+            # 只有一个机器人时不存在碰撞对象，跳过路径规划直接移动
+            return self.move_to(cube_id, x, y, angle, movement_type)
+        
         # 获取当前位置
         current_pos = self._position_tracker.get_current_position(cube_id)
         if not current_pos:
-            print(f"⚠️ 无法获取 {cube_id} 的当前位置，使用直接移动")
+            log.warning("无法获取 %s 的当前位置，使用直接移动", cube_id)
             return self.move_to(cube_id, x, y, angle, movement_type)
         
         # 检查目标位置是否安全
         if not self._collision_avoidance.is_safe_to_move(cube_id, (x, y)):
-            print(f"⚠️ 目标位置 ({x}, {y}) 不安全，{cube_id} 无法移动")
+            log.warning("目标位置 (%s, %s) 不安全，%s 无法移动", x, y, cube_id)
             return False
         
         # 请求路径规划用于冲突检测和解决
-        from .path_planner import PlanningPriority
-        success = self._path_planner.request_path(cube_id, current_pos, (x, y), PlanningPriority.NORMAL)
+        planned = self._path_planner.request_path(cube_id, current_pos, (x, y), PlanningPriority.NORMAL)
         
-        if not success:
-            print(f"❌ 路径规划请求失败: {cube_id}")
-            return False
-        
-        # 等待短暂时间让路径规划器处理冲突
-        time.sleep(0.2)
+        # 等待路径规划器处理完该请求（含冲突解决），而不是固定等待
+        try:
+            planned.result(timeout=0.5)
+        except concurrent.futures.TimeoutError:
+            log.warning("%s 路径规划未在0.5s内完成，继续移动", cube_id)
         
         # 直接移动到目标位置，让toio自己处理路径
-        print(f"🗺️ {cube_id} 安全移动到目标: ({x}, {y})")
+        log.debug("%s 安全移动到目标: (%s, %s)", cube_id, x, y)
         return self.move_to(cube_id, x, y, angle, movement_type)
     
     
@@ -523,37 +946,35 @@ class ToioController:
         if self._path_planner:
             self._path_planner.emergency_stop_all()
         
-        # 停止所有cube的移动
-        for cube_id in self._cubes:
+        # 先一次性提交所有停止命令，再统一等待，避免逐个cube串行等待
+        pending = [
+            (cube_id, self._submit(self._async_stop_movement(cube_state.cube)))
+            for cube_id, cube_state in self.get_cubes().items()
+            if cube_state.cube is not None
+        ]
+        for cube_id, future in pending:
             try:
-                self.stop_movement(cube_id)
+                future.result(timeout=1.0)
             except Exception as e:
-                print(f"❌ 停止 {cube_id} 失败: {e}")
+                future.cancel()
+                log.error("停止 %s 失败: %s", cube_id, e)
     
     def stop_movement(self, cube_id: str):
         """停止指定机器人的移动"""
-        cube_state = self._cubes.get(cube_id)
-        if not cube_state or not cube_state.connected:
+        cube_state = self._require_cube(cube_id, quiet=True)
+        if cube_state is None:
             return
         
         # 如果是模拟cube，直接返回
         if cube_state.cube is None:
-            print(f"模拟停止 {cube_id}")
+            log.debug("模拟停止 %s", cube_id)
             return
         
         try:
-            future = asyncio.run_coroutine_threadsafe(
-                self._async_stop_movement(cube_state.cube),
-                self._event_loop
-            )
-            future.result(timeout=1.0)
-            print(f"⏹️ {cube_id} 已停止移动")
+            self._call(self._async_stop_movement(cube_state.cube), 1.0)
+            log.debug("%s 已停止移动", cube_id)
         except Exception as e:
-            print(f"❌ 停止 {cube_id} 移动失败: {e}")
-    
-    async def _async_stop_movement(self, cube: ToioCoreCube):
-        """异步停止cube移动"""
-        await cube.api.motor.motor_control(left=0, right=0)
+            log.error("停止 %s 移动失败: %s", cube_id, e)
     
     def get_collision_avoidance_status(self) -> Dict[str, Any]:
         """获取避障系统状态"""
@@ -580,36 +1001,202 @@ class ToioController:
             self._setup_collision_avoidance()
         elif not enable and self._avoidance_enabled:
             self._avoidance_enabled = False
-            # 停止避障系统组件
-            if self._position_tracker:
-                self._position_tracker.stop_tracking()
-            if self._path_planner:
-                self._path_planner.stop_planner()
+            # 停止避障系统组件，重新启用时会重新创建
+            self._teardown_collision_avoidance()
             print("⚠️ 避障系统已禁用")
     
-    def __del__(self):
-        """析构函数，清理资源"""
-        self._running = False
+
+
+class AsyncToioController(ToioControllerAsync):
+    """
+    An asyncio-native controller for toio core cubes.
+    
+    Runs directly on the caller's event loop, so commands are issued without
+    the background thread and cross-thread futures that ToioController needs.
+    Collision avoidance is not wired in here; its tracker and planner are
+    thread-based and stay with ToioController.
+    """
+    
+    def __init__(self, sim_move_delay: float = 0.0, max_inflight: int = _MAX_INFLIGHT_WRITES):
+        """
+        Create the controller; call connect() to attach cubes.
         
-        # 停止避障系统
-        if self._avoidance_enabled:
-            if self._position_tracker:
-                self._position_tracker.stop_tracking()
-            if self._path_planner:
-                self._path_planner.stop_planner()
+        Args:
+            sim_move_delay: Scale for simulated travel time (1.0 ≈ real cube
+                speed, 0 = instant; keep 0 for tests and batch simulation)
+            max_inflight: Maximum number of BLE writes in flight at once
+        """
+        self._init_cube_registry(max_inflight)
+        self.sim_move_delay = sim_move_delay
+    
+    async def connect(self, num_cubes: int = 1, connect_timeout: float = 10.0):
+        """
+        Connect to the specified number of cubes.
         
-        # 清理toio连接
-        if self._event_loop and not self._event_loop.is_closed():
-            try:
-                asyncio.run_coroutine_threadsafe(self._cleanup_cubes(), self._event_loop)
-            except:
-                pass
+        Falls back to simulated cubes if no hardware can be reached.
+        
+        Args:
+            num_cubes: Number of cubes to connect to
+            connect_timeout: Timeout in seconds for the connection process
+        """
+        if num_cubes <= 0:
+            return
+        
+        try:
+            await _wait_with_timeout(
+                self._async_connect_cubes(num_cubes, connect_timeout),
+                connect_timeout + 5.0
+            )
+        except Exception as e:
+            print(f"Warning: Failed to connect to cubes: {e}")
+            print("Controller will continue in simulation mode.")
+            self._create_simulated_cubes(num_cubes)
     
-    async def _cleanup_cubes(self):
-        """清理cube连接"""
-        for cube_state in self._cubes.values():
-            if cube_state.cube:
-                try:
-                    await cube_state.cube.disconnect()
-                except:
-                    pass
+    async def close(self):
+        """Disconnect from all cubes"""
+        await self._async_close()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def move_to(
+        self,
+        cube_id: str,
+        x: int,
+        y: int,
+        angle: int = 0,
+        movement_type: MovementType = MovementType.Linear
+    ) -> bool:
+        """
+        Move a cube to the specified position on the mat.
+        
+        Args:
+            cube_id: ID of the cube to move
+            x: X coordinate to move to
+            y: Y coordinate to move to
+            angle: Angle to rotate to (0-360 degrees)
+            movement_type: Type of movement (Linear, Curve, etc.)
+            
+        Returns:
+            True if the move was successful, False otherwise
+        """
+        cube_state = self._require_cube(cube_id)
+        if cube_state is None:
+            return False
+        
+        # If this is a simulated cube, just update the position and return success
+        if cube_state.cube is None:
+            delay = self._simulate_move(cube_state, x, y, angle)
+            if delay:
+                await asyncio.sleep(delay)  # Simulate movement time
+            return True
+        
+        try:
+            return await self._async_move_and_wait(
+                cube_state, x, y, angle, movement_type
+            )
+        except Exception as e:
+            log.error("Error moving cube %s: %s", cube_id, e)
+            return False
+    
+    async def move_many(
+        self,
+        targets: Dict[str, Tuple[int, int, int]],
+        movement_type: MovementType = MovementType.Linear
+    ) -> Dict[str, bool]:
+        """
+        Move several cubes concurrently.
+        
+        Args:
+            targets: Mapping of cube ID to (x, y, angle)
+            movement_type: Type of movement (Linear, Curve, etc.)
+            
+        Returns:
+            Mapping of cube ID to whether its move was successful
+        """
+        cube_ids = list(targets)
+        outcomes = await asyncio.gather(
+            *(self.move_to(cube_id, *targets[cube_id], movement_type=movement_type)
+              for cube_id in cube_ids)
+        )
+        return dict(zip(cube_ids, outcomes))
+    
+    async def set_led(self, cube_id: str, r: int, g: int, b: int):
+        """
+        Set the LED color of a cube.
+        
+        Args:
+            cube_id: ID of the cube
+            r: Red component (0-255)
+            g: Green component (0-255)
+            b: Blue component (0-255)
+        """
+        cube_state = self._require_cube(cube_id)
+        if cube_state is None:
+            return
+        
+        if cube_state.cube is None:
+            log.debug("Simulating LED color for %s: RGB(%s,%s,%s)", cube_id, r, g, b)
+            return
+        
+        try:
+            await self._async_set_led(cube_state.cube, r, g, b)
+        except Exception as e:
+            log.error("Error setting LED for cube %s: %s", cube_id, e)
+    
+    async def play_sound(self, cube_id: str, sound_effect: int, volume: int = 100):
+        """
+        Play a sound effect on a cube.
+        
+        Args:
+            cube_id: ID of the cube
+            sound_effect: Sound effect ID to play
+            volume: Volume level (0-255)
+        """
+        cube_state = self._require_cube(cube_id)
+        if cube_state is None:
+            return
+        
+        if cube_state.cube is None:
+            log.debug("Simulating sound effect %s for %s", sound_effect, cube_id)
+            return
+        
+        try:
+            await self._async_play_sound(cube_state.cube, sound_effect, volume)
+        except Exception as e:
+            log.error("Error playing sound for cube %s: %s", cube_id, e)
+    
+    async def set_led_and_sound(self, cube_id: str, r: int, g: int, b: int,
+                                sound_effect: int, volume: int = 100):
+        """Set the LED color and play a sound effect concurrently"""
+        cube_state = self._require_cube(cube_id)
+        if cube_state is None:
+            return
+        
+        if cube_state.cube is None:
+            log.debug("Simulating LED RGB(%s,%s,%s) and sound %s for %s", r, g, b, sound_effect, cube_id)
+            return
+        
+        try:
+            await self._async_set_led_and_sound(cube_state.cube, r, g, b, sound_effect, volume)
+        except Exception as e:
+            log.error("Error setting LED and sound for cube %s: %s", cube_id, e)
+    
+    async def stop_movement(self, cube_id: str):
+        """停止指定机器人的移动"""
+        cube_state = self._require_cube(cube_id, quiet=True)
+        if cube_state is None:
+            return
+        
+        if cube_state.cube is None:
+            log.debug("模拟停止 %s", cube_id)
+            return
+        
+        try:
+            await self._async_stop_movement(cube_state.cube)
+            log.debug("%s 已停止移动", cube_id)
+        except Exception as e:
+            log.error("停止 %s 移动失败: %s", cube_id, e)
@@ -5,10 +5,134 @@
 每个动作由底层 toio 控制代码组成
 """
 
-import time
-from typing import Dict, Tuple, Optional, Any
+import asyncio
+import concurrent.futures
+import copy
+import functools
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple, Optional, Any
 from camel.toolkits import BaseToolkit, FunctionTool
-from .controller import ToioController as RealToioController
+from .controller import ToioController as RealToioController, CubeLocation
+
+log = logging.getLogger(__name__)
+
+
+# 颜色名称到RGB值的映射
+_COLOR_MAP: Dict[str, Tuple[int, int, int]] = {
+    "red": (255, 0, 0),
+    "green": (0, 255, 0),
+    "blue": (0, 0, 255),
+    "yellow": (255, 255, 0),
+    "purple": (255, 0, 255),
+    "cyan": (0, 255, 255),
+    "white": (255, 255, 255),
+    "off": (0, 0, 0)
+}
+_DEFAULT_COLOR = _COLOR_MAP["white"]
+
+# 与工作站距离小于10mm视为已到达（比较平方距离，免去开方）
+_AT_STATION_DIST_SQ = 10 * 10
+
+# 各菜品的模拟烹饪时间（秒）
+_COOK_TIMES: Dict[str, float] = {
+    "tomato_egg": 4.0,      # 西红柿炒蛋需要4秒
+    "fried_rice": 6.0,      # 炒饭需要6秒
+    "soup": 8.0,            # 汤需要8秒
+}
+
+# 烹饪分阶段播报，每阶段结束时播放音效
+_COOK_STAGE_LABELS = ("点火加热...", "翻炒中...", "调味中...", "即将完成...")
+
+# 按cube连接顺序分配的chef ID，预先生成常用数量
+_CHEF_NAMES = tuple(f"chef_{i+1}" for i in range(16))
+
+
+def _chef_names(count: int) -> Tuple[str, ...]:
+    """返回前count个chef ID"""
+    if count <= len(_CHEF_NAMES):
+        return _CHEF_NAMES[:count]
+    return tuple(f"chef_{i+1}" for i in range(count))
+
+
+@functools.singledispatch
+def _position_to_xy(position) -> Any:
+    """把控制器返回的位置转换为 (x, y)，未知类型返回 "unknown" """
+    return "unknown"
+
+
+@_position_to_xy.register
+def _(position: CubeLocation) -> Any:
+    return (position.point.x, position.point.y)
+
+
+@_position_to_xy.register
+def _(position: tuple) -> Any:
+    return tuple(position[:2])
+
+
+# 动作类型 -> 结果字典中目标字段的键名
+_TARGET_KEYS = {"pick": "ingredient", "slice": "ingredient", "cook": "dish", "serve": "dish"}
+
+
+@dataclass(slots=True, frozen=True)
+class ActionResult:
+    """单个烹饪动作的执行结果，工具返回给调用方时通过 to_dict 转为字典"""
+    success: bool
+    message: str
+    action: Optional[str] = None
+    target: Optional[str] = None              # 原料或菜品名称
+    position: Optional[Tuple[int, int]] = None
+    robot_id: Optional[str] = None
+    cook_time: Optional[float] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转为工具接口使用的字典，目标字段按动作类型命名为 ingredient 或 dish，省略空字段"""
+        result: Dict[str, Any] = {"success": self.success, "message": self.message}
+        if self.action is not None:
+            result["action"] = self.action
+        if self.target is not None:
+            result[_TARGET_KEYS.get(self.action, "target")] = self.target
+        if self.position is not None:
+            result["position"] = self.position
+        if self.robot_id is not None:
+            result["robot_id"] = self.robot_id
+        if self.cook_time is not None:
+            result["cook_time"] = self.cook_time
+        return result
+
+
+def _fail(action: str, message: str, target: Optional[str] = None) -> ActionResult:
+    """构造动作失败时的返回结果"""
+    return ActionResult(success=False, message=message, action=action, target=target)
+
+
+def _run_sync(coro):
+    """
+    在同步调用方中运行协程并返回结果
+    
+    CamelAI 以同步方式调用工具；若调用线程中已有运行中的事件循环，
+    则放到独立线程中运行，避免 asyncio.run 报错
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+# 工具包类 -> {方法名: OpenAI工具schema}，每个类只内省一次
+_TOOL_SCHEMA_CACHE: Dict[type, Dict[str, Dict[str, Any]]] = {}
+
+
+@dataclass
+class ActionNode:
+    """烹饪任务图中的一个动作节点"""
+    robot_id: str
+    action: str                 # pick / slice / cook / serve
+    target: str
+    depends_on: List[str] = field(default_factory=list)  # 前置节点ID
 
 
 class CookingToolkit(BaseToolkit):
@@ -19,6 +143,16 @@ class CookingToolkit(BaseToolkit):
     基于真实的 ToioController API
     """
     
+    # 动作类型 -> 协程实现，在类定义之后填充（见模块末尾）
+    _ACTION_DISPATCH: Dict[str, Any] = {}
+    
+    # 暴露给 agents 的工具方法
+    _TOOL_METHODS = (
+        "pick_x", "slice_x", "cook_x", "serve_x",
+        "get_kitchen_layout", "check_robot_status", "set_robot_light", "get_connection_status",
+        "execute_cooking_plan",
+    )
+    
     def __init__(self, toio_controller, kitchen_state=None):
         """
         初始化烹饪工具包
@@ -47,16 +181,11 @@ class CookingToolkit(BaseToolkit):
         }
         
         # 初始化工具列表
-        self.tools = [
-            FunctionTool(self.pick_x),
-            FunctionTool(self.slice_x), 
-            FunctionTool(self.cook_x),
-            FunctionTool(self.serve_x),
-            FunctionTool(self.get_kitchen_layout),
-            FunctionTool(self.check_robot_status),
-            FunctionTool(self.set_robot_light),
-            FunctionTool(self.get_connection_status)
-        ]
+        self.tools = self._build_tools()
+        
+        # chef_id -> cube_id 映射缓存，动作执行时不再每次查询控制器
+        self._chef_to_cube: Dict[str, str] = {}
+        self.refresh_cube_map()
         
         print("🍳 烹饪工具包初始化完成 - 基于真实ToioController API")
     
@@ -71,16 +200,15 @@ class CookingToolkit(BaseToolkit):
         Returns:
             dict: 执行结果
         """
+        return _run_sync(self.async_pick_x(robot_id, ingredient_name)).to_dict()
+    
+    async def async_pick_x(self, robot_id: str, ingredient_name: str) -> ActionResult:
+        """pick_x 的协程实现，等待期间不阻塞其他机器人"""
         print(f"🥬 {robot_id}: 开始拾取原料 '{ingredient_name}'")
         
         # 获取原料位置
         if ingredient_name not in self.ingredient_positions:
-            return {
-                "success": False,
-                "message": f"未知的原料: {ingredient_name}",
-                "action": "pick",
-                "ingredient": ingredient_name
-            }
+            return _fail("pick", f"未知的原料: {ingredient_name}", ingredient_name)
         
         ingredient_pos = self.ingredient_positions[ingredient_name]
         
@@ -88,72 +216,49 @@ class CookingToolkit(BaseToolkit):
             # 获取对应的cube_id
             cube_id = self._get_cube_id_for_chef(robot_id)
             if not cube_id:
-                return {
-                    "success": False,
-                    "message": f"无法找到{robot_id}对应的toio cube",
-                    "action": "pick",
-                    "ingredient": ingredient_name
-                }
+                return _fail("pick", f"无法找到{robot_id}对应的toio cube", ingredient_name)
             
-            # 1. 设置工作指示灯（蓝色）
-            self.toio_controller.set_led(cube_id, 0, 0, 255)
-            
-            # 2. 播放开始音效
-            self.toio_controller.play_sound(cube_id, 2, 80)
+            # 1-2. 设置工作指示灯（蓝色）并播放开始音效
+            self._signal(cube_id, (0, 0, 255), 2, 80)
             
             # 3. 移动到原料位置（使用安全移动）
-            print(f"🚶 {robot_id}: 移动到原料位置 {ingredient_pos}")
-            success = self.toio_controller.safe_move_to(cube_id, ingredient_pos[0], ingredient_pos[1])
+            log.debug("%s: 移动到原料位置 %s", robot_id, ingredient_pos)
+            success = await self._go_to_station(cube_id, ingredient_pos)
             
             if not success:
-                return {
-                    "success": False,
-                    "message": f"移动到原料位置失败",
-                    "action": "pick",
-                    "ingredient": ingredient_name
-                }
+                return _fail("pick", "移动到原料位置失败", ingredient_name)
             
-            # 4. 等待到达（模拟）
-            time.sleep(2.0)
+            # 4. 模拟拾取动作（停顿一下）
+            log.debug("%s: 拾取 %s", robot_id, ingredient_name)
+            await asyncio.sleep(1.0)  # 模拟拾取时间
             
-            # 5. 模拟拾取动作（停顿一下）
-            print(f"✋ {robot_id}: 拾取 {ingredient_name}")
-            time.sleep(1.0)  # 模拟拾取时间
+            # 5. 设置完成指示灯（绿色）并播放完成音效
+            self._signal(cube_id, (0, 255, 0), 1, 100)
             
-            # 6. 设置完成指示灯（绿色）并播放完成音效
-            self.toio_controller.set_led(cube_id, 0, 255, 0)
-            self.toio_controller.play_sound(cube_id, 1, 100)
-            
-            # 7. 更新厨房状态（如果有的话）
+            # 6. 更新厨房状态（如果有的话）
             if self.kitchen_state:
                 self.kitchen_state.update_agent(robot_id, ingredient_pos, f"picked_{ingredient_name}")
             
-            return {
-                "success": True,
-                "message": f"✅ {robot_id} 成功拾取原料 {ingredient_name}，位置: {ingredient_pos}",
-                "action": "pick",
-                "ingredient": ingredient_name,
-                "position": ingredient_pos,
-                "robot_id": robot_id
-            }
+            return ActionResult(
+                success=True,
+                message=f"✅ {robot_id} 成功拾取原料 {ingredient_name}，位置: {ingredient_pos}",
+                action="pick",
+                target=ingredient_name,
+                position=ingredient_pos,
+                robot_id=robot_id
+            )
             
         except Exception as e:
-            print(f"❌ {robot_id}: 拾取原料失败 - {e}")
+            log.error("%s: 拾取原料失败 - %s", robot_id, e)
             # 设置错误指示灯（红色）
             try:
                 cube_id = self._get_cube_id_for_chef(robot_id)
                 if cube_id:
-                    self.toio_controller.set_led(cube_id, 255, 0, 0)
-                    self.toio_controller.play_sound(cube_id, 3, 100)  # 错误音效
+                    self._signal(cube_id, (255, 0, 0), 3, 100)  # 错误音效
             except:
                 pass
             
-            return {
-                "success": False,
-                "message": f"拾取失败: {str(e)}",
-                "action": "pick",
-                "ingredient": ingredient_name
-            }
+            return _fail("pick", f"拾取失败: {str(e)}", ingredient_name)
     
     def slice_x(self, robot_id: str, ingredient_name: str) -> Dict[str, Any]:
         """
@@ -166,6 +271,10 @@ class CookingToolkit(BaseToolkit):
         Returns:
             dict: 执行结果
         """
+        return _run_sync(self.async_slice_x(robot_id, ingredient_name)).to_dict()
+    
+    async def async_slice_x(self, robot_id: str, ingredient_name: str) -> ActionResult:
+        """slice_x 的协程实现，等待期间不阻塞其他机器人"""
         print(f"🔪 {robot_id}: 开始切割原料 '{ingredient_name}'")
         
         cutting_board_pos = self.tool_positions["cutting_board"]
@@ -174,65 +283,53 @@ class CookingToolkit(BaseToolkit):
             # 获取对应的cube_id
             cube_id = self._get_cube_id_for_chef(robot_id)
             if not cube_id:
-                return {
-                    "success": False,
-                    "message": f"无法找到{robot_id}对应的toio cube",
-                    "action": "slice",
-                    "ingredient": ingredient_name
-                }
+                return _fail("slice", f"无法找到{robot_id}对应的toio cube", ingredient_name)
             
             # 1. 播放开始音效
             self.toio_controller.play_sound(cube_id, 2, 80)
             
             # 2. 移动到案板位置
-            print(f"🚶 {robot_id}: 移动到案板位置 {cutting_board_pos}")
-            success = self.toio_controller.safe_move_to(cube_id, cutting_board_pos[0], cutting_board_pos[1])
+            log.debug("%s: 移动到案板位置 %s", robot_id, cutting_board_pos)
+            success = await self._go_to_station(cube_id, cutting_board_pos)
             
             if not success:
-                return {
-                    "success": False,
-                    "message": "移动到案板位置失败",
-                    "action": "slice",
-                    "ingredient": ingredient_name
-                }
-            
-            # 3. 等待到达（模拟）
-            time.sleep(2.0)
+                return _fail("slice", "移动到案板位置失败", ingredient_name)
             
-            # 4. 模拟切割动作
-            print(f"🔪 {robot_id}: 切割 {ingredient_name}")
+            # 3. 模拟切割动作
+            log.debug("%s: 切割 %s", robot_id, ingredient_name)
             
-            # 模拟切割过程 - 多次短暂停顿
-            for i in range(3):
-                time.sleep(0.5)
-                print(f"  切割进度: {(i+1)*33}%")
-                if i < 2:  # 最后一次不播放音效
-                    self.toio_controller.play_sound(cube_id, 3, 50)
+            # 模拟切割过程 - 1.5秒内在0.5秒和1.0秒处各播放一次切菜音效
+            loop = asyncio.get_running_loop()
+            handles = [
+                loop.call_later(delay, self.toio_controller.play_sound, cube_id, 3, 50)
+                for delay in (0.5, 1.0)
+            ]
+            try:
+                await asyncio.sleep(1.5)
+            finally:
+                # 被取消时不再播放剩余音效
+                for handle in handles:
+                    handle.cancel()
             
-            # 5. 播放完成音效
+            # 4. 播放完成音效
             self.toio_controller.play_sound(cube_id, 1, 100)
             
-            # 6. 更新厨房状态
+            # 5. 更新厨房状态
             if self.kitchen_state:
                 self.kitchen_state.update_agent(robot_id, cutting_board_pos, f"sliced_{ingredient_name}")
             
-            return {
-                "success": True,
-                "message": f"✅ {robot_id} 成功切割原料 {ingredient_name}，准备完成",
-                "action": "slice",
-                "ingredient": ingredient_name,
-                "position": cutting_board_pos,
-                "robot_id": robot_id
-            }
+            return ActionResult(
+                success=True,
+                message=f"✅ {robot_id} 成功切割原料 {ingredient_name}，准备完成",
+                action="slice",
+                target=ingredient_name,
+                position=cutting_board_pos,
+                robot_id=robot_id
+            )
             
         except Exception as e:
-            print(f"❌ {robot_id}: 切割原料失败 - {e}")
-            return {
-                "success": False,
-                "message": f"切割失败: {str(e)}",
-                "action": "slice",
-                "ingredient": ingredient_name
-            }
+            log.error("%s: 切割原料失败 - %s", robot_id, e)
+            return _fail("slice", f"切割失败: {str(e)}", ingredient_name)
     
     def cook_x(self, robot_id: str, dish_name: str) -> Dict[str, Any]:
         """
@@ -245,6 +342,10 @@ class CookingToolkit(BaseToolkit):
         Returns:
             dict: 执行结果
         """
+        return _run_sync(self.async_cook_x(robot_id, dish_name)).to_dict()
+    
+    async def async_cook_x(self, robot_id: str, dish_name: str) -> ActionResult:
+        """cook_x 的协程实现，等待期间不阻塞其他机器人"""
         print(f"🍳 {robot_id}: 开始烹饪菜品 '{dish_name}'")
         
         stove_pos = self.tool_positions["stove"]
@@ -253,90 +354,59 @@ class CookingToolkit(BaseToolkit):
             # 获取对应的cube_id
             cube_id = self._get_cube_id_for_chef(robot_id)
             if not cube_id:
-                return {
-                    "success": False,
-                    "message": f"无法找到{robot_id}对应的toio cube",
-                    "action": "cook",
-                    "dish": dish_name
-                }
+                return _fail("cook", f"无法找到{robot_id}对应的toio cube", dish_name)
             
             # 1. 播放开始音效
             self.toio_controller.play_sound(cube_id, 2, 80)
             
             # 2. 移动到灶台位置
-            print(f"🚶 {robot_id}: 移动到灶台位置 {stove_pos}")
-            success = self.toio_controller.safe_move_to(cube_id, stove_pos[0], stove_pos[1])
+            log.debug("%s: 移动到灶台位置 %s", robot_id, stove_pos)
+            success = await self._go_to_station(cube_id, stove_pos)
             
             if not success:
-                return {
-                    "success": False,
-                    "message": "移动到灶台位置失败",
-                    "action": "cook",
-                    "dish": dish_name
-                }
+                return _fail("cook", "移动到灶台位置失败", dish_name)
             
-            # 3. 等待到达（模拟）
-            time.sleep(2.0)
-            
-            # 4. 模拟烹饪过程
-            print(f"🔥 {robot_id}: 烹饪 {dish_name}")
+            # 3. 模拟烹饪过程
+            log.debug("%s: 烹饪 %s", robot_id, dish_name)
             
             # 根据菜品类型模拟不同的烹饪时间
-            cook_times = {
-                "tomato_egg": 4.0,      # 西红柿炒蛋需要4秒
-                "fried_rice": 6.0,      # 炒饭需要6秒
-                "soup": 8.0,            # 汤需要8秒
-            }
-            
-            cook_time = cook_times.get(dish_name, 3.0)  # 默认3秒
+            cook_time = _COOK_TIMES.get(dish_name, 3.0)  # 默认3秒
             
-            # 分阶段烹饪，每阶段播放音效
-            stages = 4
-            stage_time = cook_time / stages
-            
-            for i in range(stages):
-                time.sleep(stage_time)
-                progress = (i + 1) * 100 // stages
-                print(f"  烹饪进度: {progress}%")
-                
-                # 烹饪过程中的音效
-                if i == 0:
-                    print(f"  🔥 点火加热...")
-                elif i == 1:
-                    print(f"  🥄 翻炒中...")
-                elif i == 2:
-                    print(f"  🧂 调味中...")
-                else:
-                    print(f"  ✨ 即将完成...")
-                
-                self.toio_controller.play_sound(cube_id, 3, 60)
+            # 分阶段烹饪：各阶段音效按各自时间点一次性调度，整体只等待一次
+            stage_time = cook_time / len(_COOK_STAGE_LABELS)
+            await asyncio.gather(*(
+                self._emit_cook_stage(robot_id, cube_id, (i + 1) * stage_time, i)
+                for i in range(len(_COOK_STAGE_LABELS))
+            ))
             
-            # 5. 播放完成音效
+            # 4. 播放完成音效
             self.toio_controller.play_sound(cube_id, 4, 100)
             print(f"✅ {robot_id}: {dish_name} 烹饪完成!")
             
-            # 6. 更新厨房状态
+            # 5. 更新厨房状态
             if self.kitchen_state:
                 self.kitchen_state.update_agent(robot_id, stove_pos, f"cooked_{dish_name}")
             
-            return {
-                "success": True,
-                "message": f"✅ {robot_id} 成功烹饪菜品 {dish_name}，烹饪完成",
-                "action": "cook",
-                "dish": dish_name,
-                "position": stove_pos,
-                "robot_id": robot_id,
-                "cook_time": cook_time
-            }
+            return ActionResult(
+                success=True,
+                message=f"✅ {robot_id} 成功烹饪菜品 {dish_name}，烹饪完成",
+                action="cook",
+                target=dish_name,
+                position=stove_pos,
+                robot_id=robot_id,
+                cook_time=cook_time
+            )
             
         except Exception as e:
-            print(f"❌ {robot_id}: 烹饪菜品失败 - {e}")
-            return {
-                "success": False,
-                "message": f"烹饪失败: {str(e)}",
-                "action": "cook",
-                "dish": dish_name
-            }
+            log.error("%s: 烹饪菜品失败 - %s", robot_id, e)
+            return _fail("cook", f"烹饪失败: {str(e)}", dish_name)
+    
+    async def _emit_cook_stage(self, robot_id: str, cube_id: str, delay: float, stage: int):
+        """在烹饪开始后的delay秒播报阶段并播放阶段音效"""
+        await asyncio.sleep(delay)
+        progress = (stage + 1) * 100 // len(_COOK_STAGE_LABELS)
+        log.debug("%s: 烹饪进度: %s%% %s", robot_id, progress, _COOK_STAGE_LABELS[stage])
+        self.toio_controller.play_sound(cube_id, 3, 60)
     
     def serve_x(self, robot_id: str, dish_name: str) -> Dict[str, Any]:
         """
@@ -349,6 +419,10 @@ class CookingToolkit(BaseToolkit):
         Returns:
             dict: 执行结果
         """
+        return _run_sync(self.async_serve_x(robot_id, dish_name)).to_dict()
+    
+    async def async_serve_x(self, robot_id: str, dish_name: str) -> ActionResult:
+        """serve_x 的协程实现，等待期间不阻塞其他机器人"""
         print(f"🍽️ {robot_id}: 开始交付菜品 '{dish_name}'")
         
         serve_pos = self.tool_positions["serve_window"]
@@ -357,68 +431,50 @@ class CookingToolkit(BaseToolkit):
             # 获取对应的cube_id
             cube_id = self._get_cube_id_for_chef(robot_id)
             if not cube_id:
-                return {
-                    "success": False,
-                    "message": f"无法找到{robot_id}对应的toio cube",
-                    "action": "serve",
-                    "dish": dish_name
-                }
+                return _fail("serve", f"无法找到{robot_id}对应的toio cube", dish_name)
             
             # 1. 播放开始音效
             self.toio_controller.play_sound(cube_id, 2, 80)
             
             # 2. 移动到交付窗口
-            print(f"🚶 {robot_id}: 移动到交付窗口 {serve_pos}")
-            success = self.toio_controller.safe_move_to(cube_id, serve_pos[0], serve_pos[1])
+            log.debug("%s: 移动到交付窗口 %s", robot_id, serve_pos)
+            success = await self._go_to_station(cube_id, serve_pos)
             
             if not success:
-                return {
-                    "success": False,
-                    "message": "移动到交付窗口失败",
-                    "action": "serve",
-                    "dish": dish_name
-                }
-            
-            # 3. 等待到达（模拟）
-            time.sleep(2.0)
+                return _fail("serve", "移动到交付窗口失败", dish_name)
             
-            # 4. 模拟交付过程
-            print(f"🎯 {robot_id}: 交付 {dish_name}")
+            # 3. 模拟交付过程
+            log.debug("%s: 交付 %s", robot_id, dish_name)
             
             # 小心放置菜品
-            print(f"  📋 检查菜品质量...")
-            time.sleep(1.0)
+            log.debug("%s: 检查菜品质量...", robot_id)
+            await asyncio.sleep(1.0)
             
-            print(f"  🍽️ 小心放置到交付窗口...")
-            time.sleep(1.5)
+            log.debug("%s: 小心放置到交付窗口...", robot_id)
+            await asyncio.sleep(1.5)
             
-            print(f"  ✅ 交付完成，等待顾客取餐...")
-            time.sleep(0.5)
+            log.debug("%s: 交付完成，等待顾客取餐...", robot_id)
+            await asyncio.sleep(0.5)
             
-            # 5. 播放完成音效
+            # 4. 播放完成音效
             self.toio_controller.play_sound(cube_id, 4, 100)
             
-            # 6. 更新厨房状态
+            # 5. 更新厨房状态
             if self.kitchen_state:
                 self.kitchen_state.update_agent(robot_id, serve_pos, f"served_{dish_name}")
             
-            return {
-                "success": True,
-                "message": f"✅ {robot_id} 成功交付菜品 {dish_name}，服务完成",
-                "action": "serve",
-                "dish": dish_name,
-                "position": serve_pos,
-                "robot_id": robot_id
-            }
+            return ActionResult(
+                success=True,
+                message=f"✅ {robot_id} 成功交付菜品 {dish_name}，服务完成",
+                action="serve",
+                target=dish_name,
+                position=serve_pos,
+                robot_id=robot_id
+            )
             
         except Exception as e:
-            print(f"❌ {robot_id}: 交付菜品失败 - {e}")
-            return {
-                "success": False,
-                "message": f"交付失败: {str(e)}",
-                "action": "serve",
-                "dish": dish_name
-            }
+            log.error("%s: 交付菜品失败 - %s", robot_id, e)
+            return _fail("serve", f"交付失败: {str(e)}", dish_name)
     
     def get_kitchen_layout(self) -> Dict[str, Any]:
         """
@@ -458,11 +514,7 @@ class CookingToolkit(BaseToolkit):
                 }
             
             # 获取真实位置信息
-            position = self.toio_controller.get_position(cube_id)
-            if position and hasattr(position, 'point'):
-                pos = (position.point.x, position.point.y)
-            else:
-                pos = "unknown"
+            pos = _position_to_xy(self.toio_controller.get_position(cube_id))
             
             return {
                 "success": True,
@@ -474,7 +526,7 @@ class CookingToolkit(BaseToolkit):
             }
             
         except Exception as e:
-            print(f"❌ 获取{robot_id}状态失败: {e}")
+            log.error("获取%s状态失败: %s", robot_id, e)
             return {
                 "success": False,
                 "message": f"获取状态失败: {str(e)}"
@@ -491,7 +543,7 @@ class CookingToolkit(BaseToolkit):
         Returns:
             dict: 执行结果
         """
-        print(f"💡 {robot_id}: 设置灯光颜色为 '{color}'")
+        log.debug("%s: 设置灯光颜色为 '%s'", robot_id, color)
         
         try:
             cube_id = self._get_cube_id_for_chef(robot_id)
@@ -501,19 +553,8 @@ class CookingToolkit(BaseToolkit):
                     "message": f"未找到机器人: {robot_id}"
                 }
             
-            # 颜色名称到RGB值的映射
-            color_map = {
-                "red": (255, 0, 0),
-                "green": (0, 255, 0),
-                "blue": (0, 0, 255),
-                "yellow": (255, 255, 0),
-                "purple": (255, 0, 255),
-                "cyan": (0, 255, 255),
-                "white": (255, 255, 255),
-                "off": (0, 0, 0)
-            }
-            
-            rgb = color_map.get(color.lower(), (255, 255, 255))
+            # 大多数调用已是小写，先直接查表
+            rgb = _COLOR_MAP.get(color) or _COLOR_MAP.get(color.lower(), _DEFAULT_COLOR)
             self.toio_controller.set_led(cube_id, rgb[0], rgb[1], rgb[2])
             
             return {
@@ -525,7 +566,7 @@ class CookingToolkit(BaseToolkit):
             }
             
         except Exception as e:
-            print(f"❌ {robot_id}: 设置灯光失败 - {e}")
+            log.error("%s: 设置灯光失败 - %s", robot_id, e)
             return {
                 "success": False,
                 "message": f"设置灯光失败: {str(e)}",
@@ -547,13 +588,13 @@ class CookingToolkit(BaseToolkit):
             return {
                 "success": True,
                 "simulation_mode": False,  # 始终为False，因为我们只支持真实模式
-                "connected_robots": {f"chef_{i+1}": {"cube_id": cube_id, "connected": cube_state.connected} 
-                                   for i, (cube_id, cube_state) in enumerate(cubes.items())},
+                "connected_robots": {chef_id: {"cube_id": cube_id, "connected": cube_state.connected} 
+                                   for chef_id, (cube_id, cube_state) in zip(_chef_names(len(cubes)), cubes.items())},
                 "num_robots": len(cubes)
             }
             
         except Exception as e:
-            print(f"❌ 获取连接状态失败 - {e}")
+            log.error("获取连接状态失败 - %s", e)
             return {
                 "success": False,
                 "message": f"获取连接状态失败: {str(e)}"
@@ -563,6 +604,75 @@ class CookingToolkit(BaseToolkit):
         """返回所有可用的工具"""
         return self.tools
     
+    def _build_tools(self) -> List[FunctionTool]:
+        """
+        为本实例创建 FunctionTool 列表
+        
+        工具schema只取决于类上的方法签名和文档，首个实例生成后按类缓存，
+        之后的实例直接传入schema副本，不再重复内省
+        """
+        schemas = _TOOL_SCHEMA_CACHE.get(type(self))
+        if schemas is None:
+            tools = [FunctionTool(getattr(self, name)) for name in self._TOOL_METHODS]
+            _TOOL_SCHEMA_CACHE[type(self)] = {
+                name: copy.deepcopy(tool.get_openai_tool_schema())
+                for name, tool in zip(self._TOOL_METHODS, tools)
+            }
+            return tools
+        
+        # 传入副本，避免某个实例修改工具描述时影响其他实例
+        return [
+            FunctionTool(getattr(self, name), openai_tool_schema=copy.deepcopy(schemas[name]))
+            for name in self._TOOL_METHODS
+        ]
+    
+    async def _go_to_station(self, cube_id: str, station: Tuple[int, int]) -> bool:
+        """
+        安全移动到工作站并等待到达；已在工作站附近时直接返回
+        
+        Returns:
+            是否已位于工作站
+        """
+        if self._is_at(cube_id, station):
+            log.debug("%s 已在 %s 附近，跳过移动", cube_id, station)
+            return True
+        
+        success = await asyncio.to_thread(
+            self.toio_controller.safe_move_to, cube_id, station[0], station[1]
+        )
+        if success:
+            # 等待到达（模拟）
+            await asyncio.sleep(2.0)
+        return success
+    
+    def _is_at(self, cube_id: str, station: Tuple[int, int]) -> bool:
+        """根据控制器缓存的最新位置判断cube是否已在工作站附近"""
+        get_position_xy = getattr(self.toio_controller, "get_position_xy", None)
+        xy = get_position_xy(cube_id) if get_position_xy is not None else None
+        if xy is None:
+            return False
+        dx = xy[0] - station[0]
+        dy = xy[1] - station[1]
+        return dx * dx + dy * dy < _AT_STATION_DIST_SQ
+    
+    def _signal(self, cube_id: str, rgb: Tuple[int, int, int], sound_effect: int, volume: int):
+        """同时设置指示灯和音效，控制器支持时合并为一条命令"""
+        set_led_and_sound = getattr(self.toio_controller, "set_led_and_sound", None)
+        if set_led_and_sound is not None:
+            set_led_and_sound(cube_id, *rgb, sound_effect, volume)
+        else:
+            self.toio_controller.set_led(cube_id, *rgb)
+            self.toio_controller.play_sound(cube_id, sound_effect, volume)
+    
+    def refresh_cube_map(self):
+        """重新建立chef_id到cube_id的映射（cube重新连接后调用）"""
+        try:
+            cube_ids = self.toio_controller.get_cube_ids()
+        except Exception as e:
+            log.warning("无法获取cube列表: %s", e)
+            cube_ids = []
+        self._chef_to_cube = dict(zip(_chef_names(len(cube_ids)), cube_ids))
+    
     def _get_cube_id_for_chef(self, robot_id: str) -> Optional[str]:
         """
         获取chef_id对应的cube_id
@@ -573,11 +683,23 @@ class CookingToolkit(BaseToolkit):
         Returns:
             对应的cube_id，如果没找到则返回None
         """
+        cube_id = self._chef_to_cube.get(robot_id)
+        if cube_id is not None:
+            return cube_id
+        
+        # 未命中（如 "Chef_1" 写法，或cube在工具包创建后才连接）时按索引解析并缓存
+        cube_id = self._resolve_cube_id(robot_id)
+        if cube_id is not None:
+            self._chef_to_cube[robot_id] = cube_id
+        return cube_id
+    
+    def _resolve_cube_id(self, robot_id: str) -> Optional[str]:
+        """从控制器查询cube列表并按chef索引解析cube_id"""
         try:
             # 从真实控制器获取cube IDs
             cube_ids = self.toio_controller.get_cube_ids()
             if not cube_ids:
-                print(f"❌ 未找到可用的toio cubes")
+                log.warning("未找到可用的toio cubes")
                 return None
             
             # 解析chef索引
@@ -585,11 +707,11 @@ class CookingToolkit(BaseToolkit):
             if chef_index < len(cube_ids):
                 return cube_ids[chef_index]
             else:
-                print(f"❌ {robot_id} 索引超出可用cube数量({len(cube_ids)})")
+                log.warning("%s 索引超出可用cube数量(%s)", robot_id, len(cube_ids))
                 return None
                 
         except Exception as e:
-            print(f"❌ 无法获取{robot_id}对应的cube_id: {e}")
+            log.error("无法获取%s对应的cube_id: %s", robot_id, e)
             return None
 
     def execute_cooking_sequence(self, robot_id: str, actions: list) -> Dict[str, Any]:
@@ -603,6 +725,10 @@ class CookingToolkit(BaseToolkit):
         Returns:
             dict: 执行结果
         """
+        return _run_sync(self.async_execute_cooking_sequence(robot_id, actions))
+    
+    async def async_execute_cooking_sequence(self, robot_id: str, actions: list) -> Dict[str, Any]:
+        """execute_cooking_sequence 的协程实现"""
         print(f"🎬 {robot_id}: 开始执行烹饪序列 ({len(actions)} 个动作)")
         
         results = []
@@ -613,36 +739,176 @@ class CookingToolkit(BaseToolkit):
             
             print(f"\n--- 动作 {i+1}/{len(actions)}: {action_type} {target} ---")
             
-            if action_type == "pick":
-                result = self.pick_x(robot_id, target)
-            elif action_type == "slice":
-                result = self.slice_x(robot_id, target)
-            elif action_type == "cook":
-                result = self.cook_x(robot_id, target)
-            elif action_type == "serve":
-                result = self.serve_x(robot_id, target)
-            else:
-                result = {
-                    "success": False,
-                    "message": f"未知的动作类型: {action_type}"
-                }
-            
+            result = await self._run_action(robot_id, action_type, target)
             results.append(result)
             
             # 如果动作失败，停止执行
-            if not result.get("success", False):
+            if not result.success:
                 print(f"❌ 动作序列在第 {i+1} 步失败，停止执行")
                 break
-            
-            # 动作间的短暂延迟
-            time.sleep(0.5)
+            # 每个动作返回时移动已由电机响应确认完成，无需额外等待
         
-        success_count = sum(1 for r in results if r.get("success", False))
+        success_count = sum(1 for r in results if r.success)
         
         return {
             "success": success_count == len(actions),
             "total_actions": len(actions),
             "completed_actions": success_count,
-            "results": results,
+            "results": [r.to_dict() for r in results],
             "robot_id": robot_id
-        }
\ No newline at end of file
+        }
+    
+    async def async_execute_sequences(self, plans: Dict[str, list]) -> Dict[str, Dict[str, Any]]:
+        """
+        多个机器人并行执行各自的烹饪序列
+        
+        Args:
+            plans: 机器人ID到动作序列的映射
+            
+        Returns:
+            dict: 机器人ID到其序列执行结果的映射
+        """
+        robot_ids = list(plans)
+        results = await asyncio.gather(
+            *(self.async_execute_cooking_sequence(robot_id, plans[robot_id]) for robot_id in robot_ids)
+        )
+        return dict(zip(robot_ids, results))
+    
+    async def _run_action(self, robot_id: str, action_type: str, target: str) -> ActionResult:
+        """按动作类型执行单个动作"""
+        method = self._ACTION_DISPATCH.get(action_type)
+        if method is None:
+            return ActionResult(success=False, message=f"未知的动作类型: {action_type}")
+        return await method(self, robot_id, target)
+    
+    def execute_cooking_plan(self, steps: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        按依赖关系执行多机器人烹饪计划，互不依赖的步骤由各自的机器人同时执行
+        
+        Args:
+            steps: 计划步骤列表，格式为 [{"id": "p1", "robot_id": "chef_1", "action": "pick",
+                "target": "eggs", "depends_on": []}, ...]；depends_on 为前置步骤ID列表，可省略
+            
+        Returns:
+            dict: 执行结果，results 为步骤ID到动作结果的映射
+        """
+        return _run_sync(self.async_execute_cooking_plan(steps))
+    
+    async def async_execute_cooking_plan(self, steps: List[Dict[str, Any]],
+                                         events: Optional[asyncio.Queue] = None) -> Dict[str, Any]:
+        """
+        execute_cooking_plan 的协程实现
+        
+        Args:
+            steps: 计划步骤列表
+            events: 可选的事件队列，依次收到 ("TASK_STARTED", step_id) 和
+                ("TASK_COMPLETED", step_id, ActionResult)
+        """
+        dag: Dict[str, ActionNode] = {}
+        for step in steps:
+            step_id = step.get("id")
+            if not step_id or step_id in dag:
+                return {"success": False, "message": f"计划步骤ID缺失或重复: {step_id}"}
+            dag[step_id] = ActionNode(
+                robot_id=step.get("robot_id"),
+                action=step.get("action"),
+                target=step.get("target"),
+                depends_on=list(step.get("depends_on") or ())
+            )
+        return await self._execute_dag(dag, events)
+    
+    async def _execute_dag(self, dag: Dict[str, ActionNode],
+                           events: Optional[asyncio.Queue] = None) -> Dict[str, Any]:
+        """
+        按依赖关系执行烹饪任务图
+        
+        前置节点全部成功后节点即进入就绪状态并立即调度；同一机器人的动作
+        依次执行。前置节点失败时其后继节点被跳过。
+        """
+        for node_id, node in dag.items():
+            for dep in node.depends_on:
+                if dep not in dag:
+                    return {"success": False, "message": f"{node_id} 依赖未知节点: {dep}"}
+        
+        # 入度与后继表
+        in_degree = {node_id: len(node.depends_on) for node_id, node in dag.items()}
+        successors: Dict[str, List[str]] = {node_id: [] for node_id in dag}
+        for node_id, node in dag.items():
+            for dep in node.depends_on:
+                successors[dep].append(node_id)
+        
+        # 一个cube同一时间只能执行一个动作
+        robot_locks = {node.robot_id: asyncio.Lock() for node in dag.values()}
+        results: Dict[str, ActionResult] = {}
+        
+        async def run_node(node_id: str) -> ActionResult:
+            node = dag[node_id]
+            async with robot_locks[node.robot_id]:
+                if events is not None:
+                    events.put_nowait(("TASK_STARTED", node_id))
+                try:
+                    return await self._run_action(node.robot_id, node.action, node.target)
+                except Exception as e:
+                    # 异常按失败处理，其余节点照常调度
+                    log.error("任务 %s 执行异常: %s", node_id, e)
+                    return _fail(node.action, f"执行异常: {e}", node.target)
+        
+        def skip_descendants(node_id: str):
+            for succ in successors[node_id]:
+                if succ not in results:
+                    results[succ] = ActionResult(success=False, message=f"前置任务 {node_id} 失败，已跳过")
+                    skip_descendants(succ)
+        
+        running = {
+            asyncio.create_task(run_node(node_id)): node_id
+            for node_id, degree in in_degree.items() if degree == 0
+        }
+        
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    node_id = running.pop(task)
+                    result = task.result()
+                    results[node_id] = result
+                    if events is not None:
+                        events.put_nowait(("TASK_COMPLETED", node_id, result))
+                    
+                    if not result.success:
+                        print(f"❌ 任务 {node_id} 失败，跳过其后续任务")
+                        skip_descendants(node_id)
+                        continue
+                    
+                    # 后继节点入度减一，变为0即就绪
+                    for succ in successors[node_id]:
+                        in_degree[succ] -= 1
+                        if in_degree[succ] == 0 and succ not in results:
+                            running[asyncio.create_task(run_node(succ))] = succ
+        finally:
+            # 提前退出（如被取消）时不留下仍在驱动机器人的任务
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        
+        # 存在环时部分节点永远不会就绪
+        for node_id in dag:
+            if node_id not in results:
+                results[node_id] = ActionResult(success=False, message="任务图存在循环依赖，未执行")
+        
+        success_count = sum(1 for r in results.values() if r.success)
+        return {
+            "success": success_count == len(dag),
+            "total_actions": len(dag),
+            "completed_actions": success_count,
+            "results": {node_id: r.to_dict() for node_id, r in results.items()}
+        }
+
+
+# 动作类型到协程实现的分发表
+CookingToolkit._ACTION_DISPATCH = {
+    "pick": CookingToolkit.async_pick_x,
+    "slice": CookingToolkit.async_slice_x,
+    "cook": CookingToolkit.async_cook_x,
+    "serve": CookingToolkit.async_serve_x,
+}
@@ -4,8 +4,12 @@
 协调多个toio机器人的路径规划，避免路径冲突和碰撞
 """
 
+import heapq
+import itertools
+import math
 import threading
 import time
+from concurrent.futures import Future
 from typing import Dict, List, Tuple, Optional, Set, Any
 from dataclasses import dataclass, field
 from enum import Enum
@@ -13,6 +17,35 @@ from .collision_avoidance import CollisionAvoidanceSystem, Position
 from .position_tracker import PositionTracker
 
 
+# 路径冲突判定：路径点间距小于50mm且到达时间相差不足2秒（每个路径点间隔0.5秒）
+_CONFLICT_DIST_SQ = 50 * 50
+# |i - j| * 0.5 < 2.0 等价于 |i - j| <= 3，只需比较这个窗口内的路径点
+_CONFLICT_STEP_WINDOW = 3
+_CONFLICT_DIST = 50
+
+# 路径监控时从上次最近的路径点起向前查找的点数
+_PROGRESS_WINDOW = 5
+
+# 路径监控间隔（秒）：默认每个规划周期检查；机器人静止且贴合路径时放宽
+_MONITOR_INTERVAL = 0.1
+_MONITOR_IDLE_INTERVAL = 0.5
+
+
+def _path_bounds(path: List[Tuple[int, int]]) -> Optional[Tuple[int, int, int, int]]:
+    """路径的包围盒 (min_x, min_y, max_x, max_y)，空路径返回None"""
+    if not path:
+        return None
+    xs = [p[0] for p in path]
+    ys = [p[1] for p in path]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def _bounds_near(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> bool:
+    """两个包围盒的间距是否小于安全距离"""
+    return (a[0] - _CONFLICT_DIST < b[2] and b[0] - _CONFLICT_DIST < a[2] and
+            a[1] - _CONFLICT_DIST < b[3] and b[1] - _CONFLICT_DIST < a[3])
+
+
 class PlanningPriority(Enum):
     """路径规划优先级"""
     LOW = 1
@@ -30,20 +63,35 @@ class PathRequest:
     priority: PlanningPriority = PlanningPriority.NORMAL
     timestamp: float = field(default_factory=time.time)
     timeout: float = 5.0    # 请求超时时间（秒）
+    # 请求处理完成时设置结果（True=规划成功）
+    done: Future = field(default_factory=Future, repr=False, compare=False)
     
     def is_expired(self) -> bool:
         """检查请求是否过期"""
         return time.time() - self.timestamp > self.timeout
+    
+    def resolve(self, success: bool):
+        """通知等待方该请求已处理（重复调用时忽略）"""
+        if not self.done.done():
+            self.done.set_result(success)
 
 
 @dataclass
 class PathPlan:
     """路径规划结果"""
     robot_id: str
-    path: List[Tuple[int, int]]  # 世界坐标路径
+    path: Tuple[Tuple[int, int], ...]  # 世界坐标路径（不可变，可直接交给调用方）
     estimated_time: float       # 估计执行时间（秒）
     created_time: float = field(default_factory=time.time)
     conflicts: List[str] = field(default_factory=list)  # 冲突的机器人ID列表
+    # 路径包围盒，用于冲突检测的快速排除（添加延迟只会重复起点，不改变包围盒）
+    bounds: Optional[Tuple[int, int, int, int]] = field(init=False, repr=False)
+    # 执行进度：上次监控时离机器人最近的路径点下标
+    progress: int = field(default=0, init=False, repr=False)
+    
+    def __post_init__(self):
+        self.path = tuple(self.path)
+        self.bounds = _path_bounds(self.path)
 
 
 class PathPlanner:
@@ -61,13 +109,24 @@ class PathPlanner:
         self.collision_system = collision_system
         self.position_tracker = position_tracker
         
-        # 规划请求队列
-        self.planning_queue: List[PathRequest] = []
+        # 规划请求队列：(-优先级, 序号, 请求) 组成的最小堆，同优先级先进先出
+        # 被取代或丢弃的请求不立即从堆中删除，出堆时发现不在 _queued 中即跳过
+        self.planning_queue: List[Tuple[int, int, PathRequest]] = []
+        self._queued: Dict[str, PathRequest] = {}  # 机器人ID -> 待处理的请求
+        self._queue_seq = itertools.count()
         self.queue_lock = threading.RLock()
+        # 新请求到达或停止时唤醒规划线程，无需等到下一个周期
+        self._queue_cv = threading.Condition(self.queue_lock)
+        self._wakeup = False
         
         # 当前活跃路径
+        # 写时复制：写入方持有paths_lock构建新字典后整体替换，读取方无需加锁
         self.active_paths: Dict[str, PathPlan] = {}
-        self.paths_lock = threading.RLock()
+        self.paths_lock = threading.Lock()
+        # 路径监控堆：(下次检查时间, 序号, 路径) 组成的最小堆，只由规划线程读写
+        # 路径被取代或移除后其条目不立即删除，出堆时发现已不是活跃路径即跳过
+        self._monitor_heap: List[Tuple[float, int, PathPlan]] = []
+        self._monitor_seq = itertools.count()
         
         # 规划线程
         self.planning_thread = None
@@ -100,12 +159,14 @@ class PathPlanner:
             return
         
         self.running = False
+        with self._queue_cv:
+            self._queue_cv.notify()
         if self.planning_thread:
             self.planning_thread.join(timeout=2.0)
         print("⏹️ 路径规划器已停止")
     
     def request_path(self, robot_id: str, start: Tuple[int, int], goal: Tuple[int, int],
-                    priority: PlanningPriority = PlanningPriority.NORMAL) -> bool:
+                    priority: PlanningPriority = PlanningPriority.NORMAL) -> Future:
         """
         请求路径规划
         
@@ -116,7 +177,7 @@ class PathPlanner:
             priority: 规划优先级
             
         Returns:
-            是否成功添加到规划队列
+            请求处理完成时得到结果的Future（True=规划成功，False=失败/过期/被取代）
         """
         request = PathRequest(
             robot_id=robot_id,
@@ -126,31 +187,79 @@ class PathPlanner:
         )
         
         with self.queue_lock:
-            # 移除同一机器人的旧请求
-            self.planning_queue = [req for req in self.planning_queue if req.robot_id != robot_id]
+            # 取代同一机器人的旧请求
+            old = self._queued.get(robot_id)
+            if old is not None:
+                old.resolve(False)
             
-            # 添加新请求，按优先级排序
-            self.planning_queue.append(request)
-            self.planning_queue.sort(key=lambda r: r.priority.value, reverse=True)
+            self._push_request(request)
+            self._wakeup = True
+            self._queue_cv.notify()
         
         print(f"📋 添加路径规划请求: {robot_id} {start} -> {goal} (优先级: {priority.name})")
-        return True
+        return request.done
+    
+    def _push_request(self, request: PathRequest):
+        """请求入堆并登记为该机器人的待处理请求（调用方需持有queue_lock）"""
+        self._queued[request.robot_id] = request
+        heapq.heappush(self.planning_queue, (-request.priority.value, next(self._queue_seq), request))
+    
+    def _pop_request(self) -> Optional[PathRequest]:
+        """取出最高优先级的有效请求，跳过已被取代或丢弃的条目（调用方需持有queue_lock）"""
+        while self.planning_queue:
+            request = heapq.heappop(self.planning_queue)[2]
+            if self._queued.get(request.robot_id) is request:
+                del self._queued[request.robot_id]
+                return request
+        return None
     
-    def get_path(self, robot_id: str) -> Optional[List[Tuple[int, int]]]:
+    def _drop_requests(self, predicate):
+        """从队列中移除满足条件的请求并通知其等待方（调用方需持有queue_lock）"""
+        for robot_id, req in list(self._queued.items()):
+            if predicate(req):
+                req.resolve(False)
+                del self._queued[robot_id]
+        if not self._queued:
+            self.planning_queue.clear()
+    
+    def get_path(self, robot_id: str) -> Optional[Tuple[Tuple[int, int], ...]]:
         """获取机器人的当前路径"""
+        plan = self.active_paths.get(robot_id)
+        return plan.path if plan else None
+    
+    def _set_path(self, plan: PathPlan):
+        """保存机器人的活跃路径"""
         with self.paths_lock:
-            plan = self.active_paths.get(robot_id)
-            return plan.path.copy() if plan else None
+            paths = dict(self.active_paths)
+            paths[plan.robot_id] = plan
+            self.active_paths = paths
+        heapq.heappush(self._monitor_heap, (time.time(), next(self._monitor_seq), plan))
+    
+    def _remove_path(self, robot_id: str, plan: Optional[PathPlan] = None) -> bool:
+        """
+        移除机器人的活跃路径
+        
+        指定plan时仅当当前路径仍是该plan才移除，避免误删期间新规划的路径
+        
+        Returns:
+            是否移除了路径
+        """
+        with self.paths_lock:
+            current = self.active_paths.get(robot_id)
+            if current is None or (plan is not None and current is not plan):
+                return False
+            paths = dict(self.active_paths)
+            del paths[robot_id]
+            self.active_paths = paths
+            return True
     
     def cancel_path(self, robot_id: str):
         """取消机器人的路径规划"""
         with self.queue_lock:
-            self.planning_queue = [req for req in self.planning_queue if req.robot_id != robot_id]
+            self._drop_requests(lambda req: req.robot_id == robot_id)
         
-        with self.paths_lock:
-            if robot_id in self.active_paths:
-                del self.active_paths[robot_id]
-                print(f"❌ 取消 {robot_id} 的路径规划")
+        if self._remove_path(robot_id):
+            print(f"❌ 取消 {robot_id} 的路径规划")
     
     def _planning_loop(self):
         """路径规划主循环"""
@@ -168,7 +277,10 @@ class PathPlanner:
                 # 清理过期数据
                 self._cleanup_expired_data()
                 
-                time.sleep(0.1)  # 100ms循环间隔
+                # 最长100ms一个周期（路径监控需要），有新请求时立即继续
+                with self._queue_cv:
+                    self._queue_cv.wait_for(lambda: self._wakeup or not self.running, timeout=0.1)
+                    self._wakeup = False
                 
             except Exception as e:
                 print(f"❌ 路径规划异常: {e}")
@@ -177,21 +289,38 @@ class PathPlanner:
         print("🗺️ 路径规划循环结束")
     
     def _process_planning_requests(self):
-        """处理路径规划请求"""
+        """
+        处理本周期内已排队的全部路径规划请求
+        
+        只处理开始时的请求数，失败后重新入队的高优先级请求留到下一周期重试
+        """
+        with self.queue_lock:
+            pending = len(self._queued)
+        for _ in range(pending):
+            self._process_next_request()
+    
+    def _process_next_request(self):
+        """处理优先级最高的一个路径规划请求"""
         with self.queue_lock:
-            if not self.planning_queue:
-                return
-            
             # 取出最高优先级请求
-            request = self.planning_queue.pop(0)
+            request = self._pop_request()
+        if request is None:
+            return
         
         # 检查请求是否过期
         if request.is_expired():
             print(f"⏰ 路径规划请求过期: {request.robot_id}")
+            request.resolve(False)
             return
         
         # 执行路径规划
-        success = self._plan_path(request)
+        try:
+            success = self._plan_path(request)
+        except Exception:
+            request.resolve(False)
+            raise
+        # 等待方只关心首次处理结果，高优先级重试不再阻塞它
+        request.resolve(success)
         
         if not success:
             print(f"❌ 路径规划失败: {request.robot_id}")
@@ -200,7 +329,9 @@ class PathPlanner:
             if request.priority in [PlanningPriority.HIGH, PlanningPriority.EMERGENCY]:
                 request.timestamp = time.time()  # 更新时间戳
                 with self.queue_lock:
-                    self.planning_queue.insert(0, request)  # 重新加入队列头部
+                    # 期间已有同一机器人的新请求时不再重试旧请求
+                    if request.robot_id not in self._queued:
+                        self._push_request(request)
     
     def _plan_path(self, request: PathRequest) -> bool:
         """执行单个路径规划"""
@@ -240,40 +371,52 @@ class PathPlanner:
                 # 对于冲突无法解决的情况，仍然保存路径但标记冲突
         
         # 保存路径规划结果
-        with self.paths_lock:
-            self.active_paths[robot_id] = plan
+        self._set_path(plan)
         
         print(f"✅ 路径规划完成: {robot_id}, 路径点数: {len(path)}, 预计时间: {plan.estimated_time:.1f}s")
         return True
     
     def _detect_path_conflicts(self, robot_id: str, path: List[Tuple[int, int]]) -> List[str]:
         """检测路径冲突"""
+        # 读取当前快照；并发新增的路径会在下一次规划时被检测到
+        active_paths = self.active_paths
+        if not active_paths or (len(active_paths) == 1 and robot_id in active_paths):
+            return []
+        
         conflicts = []
+        bounds = _path_bounds(path)
+        if bounds is None:
+            return conflicts
         
-        with self.paths_lock:
-            for other_id, other_plan in self.active_paths.items():
-                if other_id == robot_id:
-                    continue
-                
-                # 检查路径是否有时空重叠
-                if self._paths_intersect(path, other_plan.path):
-                    conflicts.append(other_id)
+        for other_id, other_plan in active_paths.items():
+            if other_id == robot_id:
+                continue
+            
+            # 包围盒相距超过安全距离的路径不可能冲突，免去逐点比较
+            if other_plan.bounds is None or not _bounds_near(bounds, other_plan.bounds):
+                continue
+            
+            # 检查路径是否有时空重叠
+            if self._paths_intersect(path, other_plan.path):
+                conflicts.append(other_id)
         
         return conflicts
     
     def _paths_intersect(self, path1: List[Tuple[int, int]], path2: List[Tuple[int, int]]) -> bool:
         """检查两条路径是否相交"""
-        # 简化的相交检测：检查是否有相同或相近的路径点
-        for i, point1 in enumerate(path1):
-            for j, point2 in enumerate(path2):
-                # 计算距离
-                distance = ((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)**0.5
-                
-                if distance < 50:  # 50mm安全距离
-                    # 检查时间重叠（假设匀速运动）
-                    time_diff = abs(i - j) * 0.5  # 假设每个路径点间隔0.5秒
-                    if time_diff < 2.0:  # 2秒安全时间间隔
-                        return True
+        # 简化的相交检测：检查是否有同一时段内相近的路径点
+        # 时间条件只允许下标相差不超过窗口的点对，因此每个点只需比较 path2 中
+        # [i - 窗口, i + 窗口] 范围内的点，而不是整条路径
+        len2 = len(path2)
+        for i, (x1, y1) in enumerate(path1):
+            lo = i - _CONFLICT_STEP_WINDOW
+            if lo >= len2:
+                break
+            for x2, y2 in path2[max(lo, 0):i + _CONFLICT_STEP_WINDOW + 1]:
+                dx = x1 - x2
+                dy = y1 - y2
+                if dx * dx + dy * dy < _CONFLICT_DIST_SQ:  # 50mm安全距离
+                    return True
         
         return False
     
@@ -288,10 +431,8 @@ class PathPlanner:
             
             # 为冲突机器人重新规划路径（延迟或绕行）
             for conflict_robot in plan.conflicts:
-                with self.paths_lock:
-                    if conflict_robot in self.active_paths:
-                        # 简单策略：为冲突机器人添加延迟
-                        self._add_path_delay(conflict_robot, 1.0)  # 1秒延迟
+                # 简单策略：为冲突机器人添加延迟
+                self._add_path_delay(conflict_robot, 1.0)  # 1秒延迟
             
             # 重新检查冲突
             new_conflicts = self._detect_path_conflicts(plan.robot_id, plan.path)
@@ -307,77 +448,110 @@ class PathPlanner:
     def _add_path_delay(self, robot_id: str, delay_seconds: float):
         """为路径添加延迟"""
         with self.paths_lock:
-            if robot_id in self.active_paths:
-                plan = self.active_paths[robot_id]
+            plan = self.active_paths.get(robot_id)
+            
+            # 在路径开始处添加等待点
+            if plan and plan.path:
+                wait_point = plan.path[0]
+                delay_steps = int(delay_seconds / 0.5)  # 假设每步0.5秒
                 
-                # 在路径开始处添加等待点
-                if plan.path:
-                    wait_point = plan.path[0]
-                    delay_steps = int(delay_seconds / 0.5)  # 假设每步0.5秒
-                    
-                    # 在路径前添加重复的起始点作为等待
-                    delayed_path = [wait_point] * delay_steps + plan.path
-                    plan.path = delayed_path
-                    plan.estimated_time += delay_seconds
-                    
-                    print(f"⏰ 为 {robot_id} 添加 {delay_seconds}s 延迟")
+                # 在路径前添加重复的起始点作为等待（整体替换路径，读取方看到的旧路径不变）
+                delayed_path = (wait_point,) * delay_steps + plan.path
+                plan.path = delayed_path
+                plan.progress += delay_steps
+                plan.estimated_time += delay_seconds
+                
+                print(f"⏰ 为 {robot_id} 添加 {delay_seconds}s 延迟")
     
     def _monitor_path_execution(self):
-        """监控路径执行情况"""
-        with self.paths_lock:
-            for robot_id, plan in list(self.active_paths.items()):
-                current_pos = self.position_tracker.get_current_position(robot_id)
-                
-                if not current_pos or not plan.path:
-                    continue
-                
-                # 检查是否偏离路径
-                deviation = self._calculate_path_deviation(current_pos, plan.path)
-                
-                if deviation > self.path_deviation_threshold:
-                    print(f"⚠️ {robot_id} 偏离路径 {deviation:.1f}mm，触发重新规划")
-                    
-                    # 触发重新规划
-                    if plan.path:
-                        goal = plan.path[-1]  # 使用原目标点
-                        self.request_path(robot_id, current_pos, goal, PlanningPriority.HIGH)
-                
-                # 检查是否到达目标
-                if plan.path and self._is_near_goal(current_pos, plan.path[-1]):
-                    print(f"🎯 {robot_id} 已到达目标")
-                    del self.active_paths[robot_id]
-    
-    def _calculate_path_deviation(self, current_pos: Tuple[int, int], 
-                                 path: List[Tuple[int, int]]) -> float:
-        """计算当前位置与路径的偏差"""
-        if not path:
-            return float('inf')
+        """监控路径执行情况，只检查到期的路径"""
+        heap = self._monitor_heap
+        now = time.time()
+        while heap and heap[0][0] <= now:
+            plan = heapq.heappop(heap)[2]
+            # 读取快照，无需持锁；移除时确认路径未被重新规划
+            if self.active_paths.get(plan.robot_id) is not plan:
+                continue
+            interval = self._monitor_plan(plan)
+            if interval is not None:
+                heapq.heappush(heap, (now + interval, next(self._monitor_seq), plan))
+    
+    def _monitor_plan(self, plan: PathPlan) -> Optional[float]:
+        """
+        检查单条路径的执行情况
+        
+        Returns:
+            距下次检查的间隔（秒），路径已完成时返回None
+        """
+        robot_id = plan.robot_id
+        current_pos = self.position_tracker.get_current_position(robot_id)
+        path = plan.path
+        
+        if not current_pos or not path:
+            return _MONITOR_INTERVAL
         
-        # 找到路径上最近的点
-        min_distance = float('inf')
-        for point in path:
-            distance = ((current_pos[0] - point[0])**2 + (current_pos[1] - point[1])**2)**0.5
-            min_distance = min(min_distance, distance)
+        # 检查是否偏离路径
+        deviation = self._track_progress(current_pos, plan, path)
+        
+        if deviation > self.path_deviation_threshold:
+            print(f"⚠️ {robot_id} 偏离路径 {deviation:.1f}mm，触发重新规划")
+            
+            # 触发重新规划
+            goal = path[-1]  # 使用原目标点
+            self.request_path(robot_id, current_pos, goal, PlanningPriority.HIGH)
+        
+        # 检查是否到达目标
+        if self._is_near_goal(current_pos, path[-1]) and self._remove_path(robot_id, plan):
+            print(f"🎯 {robot_id} 已到达目标")
+            return None
+        
+        if deviation * 2 < self.path_deviation_threshold and not self.position_tracker.is_moving(robot_id):
+            return _MONITOR_IDLE_INTERVAL
+        return _MONITOR_INTERVAL
+    
+    def _track_progress(self, current_pos: Tuple[int, int], plan: PathPlan,
+                        path: List[Tuple[int, int]]) -> float:
+        """
+        计算当前位置与路径的偏差并推进执行进度
         
-        return min_distance
+        只在上次进度之后的一小段路径中找最近点；窗口内的偏差超过阈值时
+        再扫描整条路径确认，因此是否判定为偏离与全路径扫描的结果一致
+        """
+        cx, cy = current_pos
+        start = min(plan.progress, len(path) - 1)
+        best_index = start
+        best_distance_sq = float('inf')
+        for i in range(start, min(len(path), start + _PROGRESS_WINDOW)):
+            x, y = path[i]
+            distance_sq = (cx - x) * (cx - x) + (cy - y) * (cy - y)
+            if distance_sq < best_distance_sq:
+                best_index, best_distance_sq = i, distance_sq
+        
+        threshold = self.path_deviation_threshold
+        if best_distance_sq > threshold * threshold:
+            # 窗口外可能有更近的点（如机器人跳过或退回了一段路径）
+            distances = list(map(math.dist, itertools.repeat(current_pos), path))
+            best_index = min(range(len(distances)), key=distances.__getitem__)
+            plan.progress = best_index
+            return distances[best_index]
+        
+        plan.progress = best_index
+        return best_distance_sq ** 0.5
     
     def _is_near_goal(self, current_pos: Tuple[int, int], goal: Tuple[int, int], 
                      threshold: float = 15.0) -> bool:
         """检查是否接近目标"""
-        distance = ((current_pos[0] - goal[0])**2 + (current_pos[1] - goal[1])**2)**0.5
-        return distance <= threshold
+        dx = current_pos[0] - goal[0]
+        dy = current_pos[1] - goal[1]
+        return dx * dx + dy * dy <= threshold * threshold
     
     def _estimate_execution_time(self, path: List[Tuple[int, int]]) -> float:
         """估计路径执行时间"""
         if len(path) < 2:
             return 0.0
         
-        total_distance = 0
-        for i in range(1, len(path)):
-            prev_point = path[i-1]
-            curr_point = path[i]
-            distance = ((curr_point[0] - prev_point[0])**2 + (curr_point[1] - prev_point[1])**2)**0.5
-            total_distance += distance
+        # 相邻路径点逐段求距离后累加，整个计算在C层完成
+        total_distance = sum(map(math.dist, path, itertools.islice(path, 1, None)))
         
         # 假设平均速度为50mm/s
         average_speed = 50.0  # mm/s
@@ -388,29 +562,23 @@ class PathPlanner:
         current_time = time.time()
         
         # 清理过期的活跃路径（超过预计时间很久的）
-        with self.paths_lock:
-            expired_robots = []
-            for robot_id, plan in self.active_paths.items():
-                age = current_time - plan.created_time
-                if age > plan.estimated_time + 30.0:  # 超过预计时间30秒
-                    expired_robots.append(robot_id)
-            
-            for robot_id in expired_robots:
-                del self.active_paths[robot_id]
-                print(f"🗑️ 清理过期路径: {robot_id}")
+        for robot_id, plan in self.active_paths.items():
+            age = current_time - plan.created_time
+            if age > plan.estimated_time + 30.0:  # 超过预计时间30秒
+                if self._remove_path(robot_id, plan):
+                    print(f"🗑️ 清理过期路径: {robot_id}")
         
         # 清理过期的规划请求
         with self.queue_lock:
-            self.planning_queue = [req for req in self.planning_queue if not req.is_expired()]
+            self._drop_requests(PathRequest.is_expired)
     
     def get_planner_status(self) -> Dict[str, Any]:
         """获取规划器状态"""
-        with self.queue_lock:
-            queue_count = len(self.planning_queue)
+        queue_count = len(self._queued)
         
-        with self.paths_lock:
-            active_count = len(self.active_paths)
-            active_robots = list(self.active_paths.keys())
+        active_paths = self.active_paths
+        active_count = len(active_paths)
+        active_robots = list(active_paths.keys())
         
         return {
             "running": self.running,
@@ -424,10 +592,10 @@ class PathPlanner:
     def emergency_stop_all(self):
         """紧急停止所有路径规划"""
         with self.queue_lock:
-            self.planning_queue.clear()
+            self._drop_requests(lambda req: True)
         
         with self.paths_lock:
-            self.active_paths.clear()
+            self.active_paths = {}
         
         print("🚨 紧急停止所有路径规划")
     
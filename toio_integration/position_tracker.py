@@ -4,14 +4,22 @@ toio机器人位置追踪系统
 实时监控所有toio机器人的位置，为避障系统提供数据支持
 """
 
+import queue
 import threading
 import time
-from typing import Dict, List, Tuple, Optional, Callable, Any
+from collections import deque
+from contextlib import contextmanager
+from math import hypot
+from types import MappingProxyType
+from typing import Deque, Dict, Iterator, List, Mapping, Tuple, Optional, Callable, Any, TYPE_CHECKING
 from dataclasses import dataclass
-from .controller import ToioController
 
+if TYPE_CHECKING:
+    # controller imports this module at load time; only import it for type hints
+    from .controller import ToioController
 
-@dataclass
+
+@dataclass(slots=True)
 class PositionHistory:
     """位置历史记录"""
     timestamp: float
@@ -23,10 +31,49 @@ class PositionHistory:
         return time.time() - self.timestamp
 
 
+class _ReadWriteLock:
+    """读写锁：读取方之间互不阻塞，写入方独占（不可重入）"""
+    
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writing = False
+    
+    @contextmanager
+    def read_lock(self) -> Iterator[None]:
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+    
+    @contextmanager
+    def write_lock(self) -> Iterator[None]:
+        with self._cond:
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
 class PositionTracker:
     """位置追踪器"""
     
-    def __init__(self, toio_controller: ToioController, update_interval: float = 0.1):
+    # 控制器推送位置时，追踪线程等待推送，并按此间隔清理历史记录
+    PUSH_CLEANUP_INTERVAL = 1.0
+    
+    def __init__(self, toio_controller: 'ToioController', update_interval: float = 0.1):
         """
         初始化位置追踪器
         
@@ -38,16 +85,26 @@ class PositionTracker:
         self.update_interval = update_interval
         
         # 位置数据
+        # 写时复制：写入方在锁内构建新字典后整体替换，读取方无需加锁
         self.current_positions: Dict[str, Tuple[int, int]] = {}
-        self.position_history: Dict[str, List[PositionHistory]] = {}
-        self.position_lock = threading.RLock()
+        # 每个cube的历史记录按时间先后排列，超出数量上限时自动丢弃最旧的
+        self.position_history: Dict[str, Deque[PositionHistory]] = {}
+        # 历史记录读多写少：读取方共享读锁，写入和清理时独占写锁
+        self.position_lock = _ReadWriteLock()
         
         # 回调函数
+        # 写时复制：列表只能整体替换，不能原地修改，读取方无需加锁即可遍历快照
         self.position_callbacks: List[Callable[[str, int, int], None]] = []
+        self._callbacks_write_lock = threading.Lock()  # 仅串行化写入方的读-改-写
         
         # 追踪线程
         self.tracking_thread = None
         self.running = False
+        self._stop_event = threading.Event()
+        # 控制器支持 add_position_listener 时由其推送位置变化，否则轮询
+        self._push_updates = False
+        # 推送的位置先入队，由追踪线程处理，不占用控制器的事件循环线程
+        self._pushed_positions: "queue.SimpleQueue[Optional[Tuple[str, int, int]]]" = queue.SimpleQueue()
         
         # 历史记录设置
         self.max_history_size = 50  # 最多保存50个历史位置
@@ -62,9 +119,18 @@ class PositionTracker:
             return
         
         self.running = True
+        self._stop_event.clear()
+        
+        add_listener = getattr(self.toio_controller, "add_position_listener", None)
+        self._push_updates = add_listener is not None
+        if self._push_updates:
+            add_listener(self._on_position_pushed)
+            # 先读取一次当前位置，之后只在位置变化时收到推送
+            self._update_positions(self._read_positions())
+        
         self.tracking_thread = threading.Thread(target=self._tracking_loop, daemon=True)
         self.tracking_thread.start()
-        print("🚀 位置追踪已启动")
+        print(f"🚀 位置追踪已启动（{'推送' if self._push_updates else '轮询'}模式）")
     
     def stop_tracking(self):
         """停止位置追踪"""
@@ -72,6 +138,11 @@ class PositionTracker:
             return
         
         self.running = False
+        self._stop_event.set()
+        if self._push_updates:
+            self.toio_controller.remove_position_listener(self._on_position_pushed)
+            self._pushed_positions.put_nowait(None)  # 唤醒等待推送的追踪线程
+            self._push_updates = False
         if self.tracking_thread:
             self.tracking_thread.join(timeout=2.0)
         print("⏹️ 位置追踪已停止")
@@ -80,76 +151,129 @@ class PositionTracker:
         """位置追踪主循环"""
         print("📍 位置追踪循环开始...")
         
+        next_cleanup = time.monotonic() + self.PUSH_CLEANUP_INTERVAL
+        
         while self.running:
             try:
-                # 获取所有cube的当前位置
-                cubes = self.toio_controller.get_cubes()
-                
-                for cube_id, cube in cubes.items():
-                    position = self.toio_controller.get_position(cube_id)
-                    
-                    if position and hasattr(position, 'point'):
-                        x, y = position.point.x, position.point.y
-                        self._update_position(cube_id, x, y)
+                if self._push_updates:
+                    # 推送模式：处理队列中的位置，到清理时间再清理历史记录
+                    self._drain_pushed_positions(max(0.0, next_cleanup - time.monotonic()))
+                    now = time.monotonic()
+                    if now < next_cleanup:
+                        continue
+                    next_cleanup = now + self.PUSH_CLEANUP_INTERVAL
+                else:
+                    # 轮询模式：获取所有cube的当前位置，一次性更新
+                    self._update_positions(self._read_positions())
                 
                 # 清理过期的历史记录
                 self._cleanup_history()
                 
-                time.sleep(self.update_interval)
-                
             except Exception as e:
                 print(f"❌ 位置追踪异常: {e}")
-                time.sleep(self.update_interval)
+            
+            if not self._push_updates:
+                # stop_tracking 时立即唤醒
+                self._stop_event.wait(self.update_interval)
         
         print("📍 位置追踪循环结束")
     
+    def _read_positions(self) -> Dict[str, Tuple[int, int]]:
+        """读取所有cube的最新位置，控制器提供批量接口时一次读取"""
+        get_all_positions = getattr(self.toio_controller, "get_all_positions", None)
+        if get_all_positions is not None:
+            return get_all_positions()
+        
+        positions = {}
+        get_position = self.toio_controller.get_position
+        for cube_id in self.toio_controller.get_cubes():
+            position = get_position(cube_id)
+            try:
+                positions[cube_id] = (position.point.x, position.point.y)
+            except AttributeError:
+                continue  # 位置未知（None）
+        return positions
+    
+    def _on_position_pushed(self, cube_id: str, x: int, y: int):
+        """控制器的位置监听器：只入队，由追踪线程更新位置和触发回调"""
+        self._pushed_positions.put_nowait((cube_id, x, y))
+    
+    def _drain_pushed_positions(self, timeout: float):
+        """等待推送的位置，取出队列中已有的全部位置后批量更新"""
+        try:
+            item = self._pushed_positions.get(timeout=timeout)
+        except queue.Empty:
+            return
+        
+        # 同一cube只保留最新位置
+        positions = {}
+        while item is not None:
+            cube_id, x, y = item
+            positions[cube_id] = (x, y)
+            try:
+                item = self._pushed_positions.get_nowait()
+            except queue.Empty:
+                break
+        
+        if positions:
+            self._update_positions(positions)
+    
     def _update_position(self, cube_id: str, x: int, y: int):
         """更新机器人位置"""
-        with self.position_lock:
-            # 检查位置是否发生变化
-            current_pos = self.current_positions.get(cube_id)
-            if current_pos == (x, y):
-                return  # 位置未变化，跳过更新
-            
-            # 更新当前位置
-            self.current_positions[cube_id] = (x, y)
-            
-            # 添加到历史记录
-            if cube_id not in self.position_history:
-                self.position_history[cube_id] = []
+        self._update_positions({cube_id: (x, y)})
+    
+    def _update_positions(self, positions: Dict[str, Tuple[int, int]]):
+        """批量更新机器人位置，只加一次锁、替换一次字典"""
+        changed = []
+        with self.position_lock.write_lock():
+            current = self.current_positions
+            updated = None
+            now = time.time()
             
-            self.position_history[cube_id].append(
-                PositionHistory(timestamp=time.time(), x=x, y=y)
-            )
+            for cube_id, (x, y) in positions.items():
+                # 检查位置是否发生变化
+                if current.get(cube_id) == (x, y):
+                    continue  # 位置未变化，跳过更新
+                
+                # 更新当前位置（整体替换字典，不原地修改）
+                if updated is None:
+                    updated = dict(current)
+                updated[cube_id] = (x, y)
+                
+                # 添加到历史记录（deque的maxlen限制历史记录数量）
+                history = self.position_history.get(cube_id)
+                if history is None:
+                    history = self.position_history[cube_id] = deque(maxlen=self.max_history_size)
+                history.append(PositionHistory(timestamp=now, x=x, y=y))
+                changed.append((cube_id, x, y))
             
-            # 限制历史记录数量
-            if len(self.position_history[cube_id]) > self.max_history_size:
-                self.position_history[cube_id] = self.position_history[cube_id][-self.max_history_size:]
+            if updated is not None:
+                self.current_positions = updated
         
         # 触发回调
-        self._trigger_position_callbacks(cube_id, x, y)
+        for cube_id, x, y in changed:
+            self._trigger_position_callbacks(cube_id, x, y)
     
     def _cleanup_history(self):
         """清理过期的历史记录"""
         current_time = time.time()
         
-        with self.position_lock:
+        with self.position_lock.write_lock():
             for cube_id in list(self.position_history.keys()):
                 history = self.position_history[cube_id]
                 
-                # 过滤掉过期的记录
-                self.position_history[cube_id] = [
-                    record for record in history
-                    if current_time - record.timestamp <= self.max_history_age
-                ]
+                # 记录按时间排列，从最旧的一端弹出过期记录即可
+                while history and current_time - history[0].timestamp > self.max_history_age:
+                    history.popleft()
                 
                 # 如果历史记录为空且cube不在当前位置中，删除该cube的记录
-                if not self.position_history[cube_id] and cube_id not in self.current_positions:
+                if not history and cube_id not in self.current_positions:
                     del self.position_history[cube_id]
     
     def _trigger_position_callbacks(self, cube_id: str, x: int, y: int):
         """触发位置更新回调"""
-        for callback in self.position_callbacks:
+        callbacks = self.position_callbacks  # 快照引用，无需加锁
+        for callback in callbacks:
             try:
                 callback(cube_id, x, y)
             except Exception as e:
@@ -157,24 +281,25 @@ class PositionTracker:
     
     def add_position_callback(self, callback: Callable[[str, int, int], None]):
         """添加位置更新回调函数"""
-        self.position_callbacks.append(callback)
+        with self._callbacks_write_lock:
+            self.position_callbacks = self.position_callbacks + [callback]
         print(f"📍 添加位置回调，总数: {len(self.position_callbacks)}")
     
     def remove_position_callback(self, callback: Callable[[str, int, int], None]):
         """移除位置更新回调函数"""
-        if callback in self.position_callbacks:
-            self.position_callbacks.remove(callback)
-            print(f"📍 移除位置回调，总数: {len(self.position_callbacks)}")
+        with self._callbacks_write_lock:
+            if callback not in self.position_callbacks:
+                return
+            self.position_callbacks = [cb for cb in self.position_callbacks if cb != callback]
+        print(f"📍 移除位置回调，总数: {len(self.position_callbacks)}")
     
     def get_current_position(self, cube_id: str) -> Optional[Tuple[int, int]]:
         """获取机器人当前位置"""
-        with self.position_lock:
-            return self.current_positions.get(cube_id)
+        return self.current_positions.get(cube_id)
     
-    def get_all_positions(self) -> Dict[str, Tuple[int, int]]:
-        """获取所有机器人的当前位置"""
-        with self.position_lock:
-            return self.current_positions.copy()
+    def get_all_positions(self) -> Mapping[str, Tuple[int, int]]:
+        """获取所有机器人的当前位置（只读快照，之后的更新不会反映到其中）"""
+        return MappingProxyType(self.current_positions)
     
     def get_position_history(self, cube_id: str, max_age: float = None) -> List[PositionHistory]:
         """
@@ -187,20 +312,24 @@ class PositionTracker:
         Returns:
             位置历史列表（按时间顺序）
         """
-        with self.position_lock:
+        with self.position_lock.read_lock():
             if cube_id not in self.position_history:
                 return []
             
             history = self.position_history[cube_id]
             
             if max_age is None:
-                return history.copy()
+                return list(history)
             
+            # 从最新的记录往回取，遇到第一条过期记录即停止
             current_time = time.time()
-            return [
-                record for record in history
-                if current_time - record.timestamp <= max_age
-            ]
+            recent = []
+            for record in reversed(history):
+                if current_time - record.timestamp > max_age:
+                    break
+                recent.append(record)
+            recent.reverse()
+            return recent
     
     def get_movement_vector(self, cube_id: str, time_window: float = 1.0) -> Optional[Tuple[float, float]]:
         """
@@ -274,37 +403,39 @@ class PositionTracker:
         if len(history) < 2:
             return False
         
-        # 计算总移动距离
+        # 累计移动距离，达到阈值即可判定在移动
         total_distance = 0
-        for i in range(1, len(history)):
-            prev = history[i-1]
-            curr = history[i]
-            distance = ((curr.x - prev.x)**2 + (curr.y - prev.y)**2)**0.5
-            total_distance += distance
+        prev = history[0]
+        for curr in history[1:]:
+            total_distance += hypot(curr.x - prev.x, curr.y - prev.y)
+            if total_distance >= min_distance:
+                return True
+            prev = curr
         
-        return total_distance >= min_distance
+        return False
     
     def get_tracking_status(self) -> Dict[str, Any]:
         """获取追踪状态"""
-        with self.position_lock:
-            status = {
-                "running": self.running,
-                "update_interval": self.update_interval,
-                "tracked_cubes": len(self.current_positions),
-                "cubes": {}
-            }
-            
-            for cube_id in self.current_positions:
-                history_count = len(self.position_history.get(cube_id, []))
-                moving = self.is_moving(cube_id)
-                
-                status["cubes"][cube_id] = {
-                    "position": self.current_positions[cube_id],
-                    "history_count": history_count,
-                    "moving": moving
-                }
+        # 基于位置快照遍历，is_moving 自行获取读锁，这里无需持锁
+        positions = self.current_positions
+        status = {
+            "running": self.running,
+            "update_interval": self.update_interval,
+            "tracked_cubes": len(positions),
+            "cubes": {}
+        }
+        
+        for cube_id, position in positions.items():
+            history_count = len(self.position_history.get(cube_id, ()))
+            moving = self.is_moving(cube_id)
             
-            return status
+            status["cubes"][cube_id] = {
+                "position": position,
+                "history_count": history_count,
+                "moving": moving
+            }
+        
+        return status
     
     def force_position_update(self, cube_id: str, x: int, y: int):
         """强制更新位置（用于测试或手动校正）"""
@@ -6,23 +6,20 @@ pick_x, slice_x, cook_x, serve_x
 """
 
 import os
+import sys
 import asyncio
 from dotenv import load_dotenv
 
-# 导入核心组件
+# 导入核心组件（toio 和 agents 依赖较重，在用到的演示中再导入）
 from core import SharedKitchenState
-from toio import ToioController, CookingToolkit
-from agents import make_toolkit_enabled_chef_team
 
 # 加载环境变量
 load_dotenv()
 
 
-def demo_basic_toolkit_functions():
-    """演示基本的工具包功能"""
-    print("=" * 80)
-    print("🔧 基本工具包功能演示")
-    print("=" * 80)
+def create_components():
+    """创建各演示共用的组件：toio 控制器（模拟模式）、状态空间和烹饪工具包"""
+    from toio import ToioController, CookingToolkit
     
     # 1. 创建 toio 控制器（模拟模式）
     toio_controller = ToioController(simulation_mode=True)
@@ -35,6 +32,19 @@ def demo_basic_toolkit_functions():
     cooking_toolkit = CookingToolkit(toio_controller, kitchen_state)
     
     print("✅ 所有组件创建完成")
+    return toio_controller, kitchen_state, cooking_toolkit
+
+
+def demo_basic_toolkit_functions(toio_controller=None, kitchen_state=None, cooking_toolkit=None):
+    """演示基本的工具包功能"""
+    print("=" * 80)
+    print("🔧 基本工具包功能演示")
+    print("=" * 80)
+    
+    # 创建组件（未传入时）
+    if cooking_toolkit is None:
+        toio_controller, kitchen_state, cooking_toolkit = create_components()
+    
     print(f"📊 初始机器人状态:")
     for robot_id, status in toio_controller.get_all_robots_status().items():
         print(f"  {robot_id}: {status}")
@@ -79,17 +89,15 @@ def demo_basic_toolkit_functions():
     return toio_controller, kitchen_state, cooking_toolkit
 
 
-def demo_cooking_sequence():
+def demo_cooking_sequence(toio_controller=None, kitchen_state=None, cooking_toolkit=None):
     """演示完整的烹饪序列"""
     print("\n" + "=" * 80)
     print("🍳 完整烹饪序列演示")
     print("=" * 80)
     
-    # 创建组件
-    toio_controller = ToioController(simulation_mode=True)
-    toio_controller.connect()
-    kitchen_state = SharedKitchenState()
-    cooking_toolkit = CookingToolkit(toio_controller, kitchen_state)
+    # 创建组件（未传入时）
+    if cooking_toolkit is None:
+        toio_controller, kitchen_state, cooking_toolkit = create_components()
     
     # 定义烹饪序列：制作西红柿炒蛋
     cooking_sequence = [
@@ -115,19 +123,18 @@ def demo_cooking_sequence():
     return toio_controller, kitchen_state, cooking_toolkit
 
 
-def demo_agent_with_tools():
+def demo_agent_with_tools(toio_controller=None, kitchen_state=None, cooking_toolkit=None):
     """演示具备工具包的智能体"""
     print("\n" + "=" * 80)
     print("🤖 智能体工具包集成演示")
     print("=" * 80)
     
-    # 创建组件
-    toio_controller = ToioController(simulation_mode=True)
-    toio_controller.connect()
-    kitchen_state = SharedKitchenState()
-    cooking_toolkit = CookingToolkit(toio_controller, kitchen_state)
+    # 创建组件（未传入时）
+    if cooking_toolkit is None:
+        toio_controller, kitchen_state, cooking_toolkit = create_components()
     
     # 创建具备工具包的厨师团队
+    from agents import make_toolkit_enabled_chef_team
     chef_team = make_toolkit_enabled_chef_team(kitchen_state, cooking_toolkit)
     
     print("👥 创建具备工具包功能的厨师团队:")
@@ -163,79 +170,105 @@ def demo_agent_with_tools():
     return chef_team, toio_controller, kitchen_state, cooking_toolkit
 
 
-def demo_multi_agent_coordination():
+async def demo_multi_agent_coordination(toio_controller=None, kitchen_state=None, cooking_toolkit=None):
     """演示多智能体协调"""
     print("\n" + "=" * 80)
     print("👥 多智能体协调演示")
     print("=" * 80)
     
-    # 创建组件
-    toio_controller = ToioController(simulation_mode=True)
-    toio_controller.connect()
-    kitchen_state = SharedKitchenState()
-    cooking_toolkit = CookingToolkit(toio_controller, kitchen_state)
+    # 创建组件（未传入时）
+    if cooking_toolkit is None:
+        toio_controller, kitchen_state, cooking_toolkit = create_components()
     
     # 创建厨师团队
+    from agents import make_toolkit_enabled_chef_team
     chef_team = make_toolkit_enabled_chef_team(kitchen_state, cooking_toolkit)
     
     print("🎯 多智能体协作任务：同时制作2份西红柿炒蛋")
     
-    # 任务分配
+    # 任务分配：每个智能体按顺序执行自己的指令列表
     tasks = {
-        'chef_1': "你是炒菜专家，请负责烹饪工作。先检查状态，然后烹饪西红柿炒蛋。",
-        'chef_2': "你是备菜专家，请负责准备工作。先拾取西红柿，然后切好西红柿。",
-        'chef_3': "你是辅助料理，请负责最后的交付。检查状态后交付制作好的西红柿炒蛋。"
+        'chef_1': ["你是炒菜专家，请负责烹饪工作。先检查状态，然后烹饪西红柿炒蛋。"],
+        'chef_2': ["你是备菜专家，请负责准备工作。先拾取西红柿，然后切好西红柿。"],
+        'chef_3': ["你是辅助料理，请负责最后的交付。检查状态后交付制作好的西红柿炒蛋。"]
     }
     
     print("\n📋 任务分配:")
-    for agent_id, task in tasks.items():
+    for agent_id, instructions in tasks.items():
         agent = chef_team[agent_id]
         print(f"\n🎯 {agent_id} ({agent.specialization}):")
-        print(f"  任务: {task}")
-        
-        print(f"  执行中...")
-        response = agent.step(task)
-        
-        print(f"  回应: {response.msg.content[:100]}...")  # 只显示前100字符
+        for task in instructions:
+            print(f"  任务: {task}")
+    
+    async def run_chef(agent_id: str, instructions: list) -> list:
+        """依次执行一个智能体的指令，step() 阻塞在 LLM 请求上，放到线程中执行"""
+        agent = chef_team[agent_id]
+        return [await asyncio.to_thread(agent.step, task) for task in instructions]
+    
+    # 同一智能体的指令保持先后顺序，不同智能体之间并发执行
+    # 总耗时取决于最慢的一个智能体，而不是所有智能体之和
+    print(f"\n⏱️ 所有智能体并发执行中...")
+    chef_responses = await asyncio.gather(*(
+        run_chef(agent_id, instructions) for agent_id, instructions in tasks.items()
+    ))
+    
+    for agent_id, responses in zip(tasks, chef_responses):
+        for response in responses:
+            print(f"  {agent_id} 回应: {response.msg.content[:100]}...")  # 只显示前100字符
     
     print(f"\n📊 所有智能体执行完毕后的状态:")
+    all_status = toio_controller.get_all_robots_status()  # 一次取回所有机器人状态
     for robot_id in ['chef_1', 'chef_2', 'chef_3']:
-        status = toio_controller.get_robot_status(robot_id)
+        status = all_status[robot_id]
         print(f"  {robot_id}: 位置 {status['position']}, 状态 {status['status']}")
     
     return chef_team, toio_controller, kitchen_state, cooking_toolkit
 
 
-async def demo_async_operations():
-    """演示异步操作"""
+async def demo_async_operations(toio_controller=None, kitchen_state=None, cooking_toolkit=None,
+                                max_concurrent_robots=None):
+    """
+    演示异步操作
+    
+    Args:
+        max_concurrent_robots: 同时执行任务的机器人数量上限，None表示不限制
+    """
     print("\n" + "=" * 80)
     print("⚡ 异步操作演示")
     print("=" * 80)
     
-    # 创建组件
-    toio_controller = ToioController(simulation_mode=True)
-    toio_controller.connect()
-    kitchen_state = SharedKitchenState()
-    cooking_toolkit = CookingToolkit(toio_controller, kitchen_state)
+    # 创建组件（未传入时）
+    if cooking_toolkit is None:
+        toio_controller, kitchen_state, cooking_toolkit = create_components()
     
     print("🚀 同时执行多个异步烹饪动作:")
     
+    # 动作类型到工具包方法的分发表，只构建一次
+    dispatch = {
+        'pick': cooking_toolkit.pick_x,
+        'slice': cooking_toolkit.slice_x,
+        'cook': cooking_toolkit.cook_x,
+        'serve': cooking_toolkit.serve_x,
+    }
+    
     # 定义异步任务
-    async def async_cooking_task(robot_id: str, actions: list):
+    async def async_cooking_task(robot_id: str, actions: list, interval: float = 0.5):
         print(f"🤖 {robot_id} 开始异步烹饪任务")
+        # 模拟动作间隔：整个任务至少持续 interval × 动作数 秒。开始时算好截止时间，
+        # 结束时只等待一次剩余时间，不在每个动作后单独 sleep；interval 为0时不等待
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + interval * len(actions)
+        
         for action in actions:
-            if action['type'] == 'pick':
-                result = cooking_toolkit.pick_x(robot_id, action['target'])
-            elif action['type'] == 'slice':
-                result = cooking_toolkit.slice_x(robot_id, action['target'])
-            elif action['type'] == 'cook':
-                result = cooking_toolkit.cook_x(robot_id, action['target'])
-            elif action['type'] == 'serve':
-                result = cooking_toolkit.serve_x(robot_id, action['target'])
+            # 工具包调用是阻塞的，放到线程中执行，其他机器人的任务才能同时推进
+            # 同一机器人的动作依赖前一步的状态，仍按顺序等待结果
+            result = await asyncio.to_thread(dispatch[action['type']], robot_id, action['target'])
             
-            await asyncio.sleep(0.5)  # 模拟动作间隔
             print(f"  {robot_id}: {action['type']} {action['target']} - {'✅' if result['success'] else '❌'}")
         
+        if interval > 0:
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+        
         print(f"✅ {robot_id} 异步任务完成")
         return robot_id
     
@@ -254,14 +287,37 @@ async def demo_async_operations():
         ])
     ]
     
+    # 超出上限的机器人任务等待其他任务完成后再开始
+    limit = asyncio.Semaphore(max_concurrent_robots or len(tasks))
+    
+    async def bounded(task):
+        async with limit:
+            return await task
+    
     # 并行执行
     print("⏱️ 开始并行执行...")
-    results = await asyncio.gather(*tasks)
+    if sys.version_info >= (3, 11):
+        # TaskGroup：任一任务失败时取消其余任务，不会留下仍在运行的任务
+        async with asyncio.TaskGroup() as tg:
+            handles = [tg.create_task(bounded(task)) for task in tasks]
+        results = [handle.result() for handle in handles]
+    else:
+        results = await asyncio.gather(*(bounded(task) for task in tasks))
     print(f"🎉 所有异步任务完成: {results}")
     
     return toio_controller, kitchen_state, cooking_toolkit
 
 
+async def run_async_demos(toio_controller, kitchen_state, cooking_toolkit):
+    """在同一个事件循环中依次运行异步演示（演示4、5）"""
+    # 演示4: 多智能体协调
+    await demo_multi_agent_coordination(toio_controller, kitchen_state, cooking_toolkit)
+    
+    # 演示5: 异步操作
+    print("\n🔄 启动异步演示...")
+    await demo_async_operations(toio_controller, kitchen_state, cooking_toolkit)
+
+
 def main():
     """主演示程序"""
     print("🤖 Toio 烹饪工具包完整演示")
@@ -275,21 +331,20 @@ def main():
     print("=" * 80)
     
     try:
+        # 所有演示共用一套组件，只创建和连接一次
+        components = create_components()
+        
         # 演示1: 基本功能
-        toio1, state1, toolkit1 = demo_basic_toolkit_functions()
+        demo_basic_toolkit_functions(*components)
         
         # 演示2: 烹饪序列
-        toio2, state2, toolkit2 = demo_cooking_sequence()
+        demo_cooking_sequence(*components)
         
         # 演示3: 智能体集成
-        team3, toio3, state3, toolkit3 = demo_agent_with_tools()
-        
-        # 演示4: 多智能体协调
-        team4, toio4, state4, toolkit4 = demo_multi_agent_coordination()
+        demo_agent_with_tools(*components)
         
-        # 演示5: 异步操作
-        print("\n🔄 启动异步演示...")
-        asyncio.run(demo_async_operations())
+        # 演示4、5: 共用一个事件循环，只创建和关闭一次
+        asyncio.run(run_async_demos(*components))
         
         print("\n" + "=" * 80)
         print("🎉 所有演示完成！")